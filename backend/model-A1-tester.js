@@ -1,6 +1,11 @@
 import { spawn } from "child_process";
+import { modelServerUrl, requestModelServer } from "./model-server-client.js";
 
 export async function modelA1tester(soil_data) {
+  if (modelServerUrl()) {
+    return requestModelServer("/A1", soil_data);
+  }
+
   return new Promise((resolve, reject) => {
     const inputJSON = JSON.stringify(soil_data);
     const pythonProcess = spawn("python3", ["../models/A/modelA1.py"]);
@@ -1,6 +1,11 @@
 import { spawn } from "child_process";
+import { modelServerUrl, requestModelServer } from "./model-server-client.js";
 
 export async function modelA2tester(yield_data) {
+  if (modelServerUrl()) {
+    return requestModelServer("/A2", yield_data);
+  }
+
   return new Promise((resolve, reject) => {
     const inputJSON = JSON.stringify(yield_data);
     const pythonProcess = spawn("python3", ["../models/A/modelA2.py"]);
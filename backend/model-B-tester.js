@@ -1,6 +1,11 @@
 import { spawn } from 'child_process';
+import { modelServerUrl, requestModelServer } from './model-server-client.js';
 
 export async function modelBtester(input_data) {
+  if (modelServerUrl()) {
+    return requestModelServer("/B", { input_data });
+  }
+
   return new Promise((resolve, reject) => {
     const inputJSON = JSON.stringify({ input_data });
 
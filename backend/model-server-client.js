@@ -0,0 +1,22 @@
+// Client for the warm Python model server (models/serve.py).
+// Set MODEL_SERVER_URL (e.g. http://127.0.0.1:8500) to route predictions
+// through it instead of spawning a fresh python3 process per request.
+// Read per request, not at import: index.js loads .env after requiring the routes.
+
+export function modelServerUrl() {
+  return process.env.MODEL_SERVER_URL;
+}
+
+export async function requestModelServer(route, payload) {
+  const response = await fetch(`${modelServerUrl()}${route}`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(payload),
+  });
+
+  const result = await response.json();
+  if (!response.ok) {
+    throw new Error("Model server returned " + response.status + ": " + (result.error || ""));
+  }
+  return result;
+}
@@ -1,25 +1,45 @@
 import json
-import pickle
 import sys
 import numpy as np
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-# Load models and label encoder
+from prediction_cache import QuantizedLRUCache
+from registry import ModelRegistry
+
+# Models and label encoder are unpickled on first use, not at import
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-model_path = os.path.join(BASE_DIR, "crop_classifier", "XGBoostClassifier.pkl")
-XGBC = pickle.load(open(model_path, "rb"))
+# Shared serving helpers (tree_engine) live one level up in models/
+sys.path.insert(1, os.path.dirname(BASE_DIR))
+registry = ModelRegistry(BASE_DIR, {
+    "xgb": os.path.join("crop_classifier", "XGBoostClassifier.pkl"),
+    "rfc": os.path.join("crop_classifier", "RandomForestClassifier.pkl"),
+    "le": os.path.join("crop_classifier", "LabelEncoder.pkl"),
+})
+
+# The label encoder is a few hundred bytes and every prediction needs it
+le = registry.get("le")
 
-model_path = os.path.join(BASE_DIR, "crop_classifier", "RandomForestClassifier.pkl")
-RFC = pickle.load(open(model_path, "rb"))
+# Module attributes kept for callers that still reference the eager globals
+_registry_aliases = {"XGBC": "xgb", "RFC": "rfc"}
 
-model_path = os.path.join(BASE_DIR, "crop_classifier", "LabelEncoder.pkl")
-le = pickle.load(open(model_path, "rb"))
+def __getattr__(name):
+    if name in _registry_aliases:
+        return registry.get(_registry_aliases[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 crops = ['apple', 'banana', 'blackgram', 'chickpea', 'coconut', 'coffee', 'cotton',
          'grapes', 'jute', 'kidneybeans', 'lentil', 'maize', 'mango', 'mothbeans',
          'mungbean', 'muskmelon', 'orange', 'papaya', 'pigeonpeas', 'pomegranate', 'rice', 'watermelon']
 
-def predict_soil_classification(data, model="xgb"):
+# Input fields in the column order the classifiers were trained on
+soil_fields = ["Nitrogen", "Phosphorus", "Potassium", "temprature", "humidity", "ph", "rainfall"]
+
+# Encoded class index -> crop name, so batches map labels with one fancy-index
+crop_names = np.array(crops)[le.inverse_transform(np.arange(len(le.classes_)))]
+
+def predict_soil_classification(data, model="xgb", engine="sklearn"):
     try:
         features = np.array([[
             float(data["Nitrogen"]),
@@ -31,10 +51,8 @@ def predict_soil_classification(data, model="xgb"):
             float(data["rainfall"])
         ]])
 
-        if model == "xgb":
-            encoded_prediction = XGBC.predict(features)[0]
-        elif model == "rfc":
-            encoded_prediction = RFC.predict(features)[0]
+        if model in ("xgb", "rfc"):
+            encoded_prediction = registry.get(model, engine).predict(features)[0]
         else:
             raise ValueError("Invalid model choice: use 'xgb' or 'rfc'")
 
@@ -47,12 +65,191 @@ def predict_soil_classification(data, model="xgb"):
         raise e
 
 
-if __name__ == "__main__":
-    input_str = sys.stdin.read()
-    soil_data = json.loads(input_str)
+# Decimals kept per field when keying the prediction cache
+soil_cache_precision = {
+    "Nitrogen": 0,
+    "Phosphorus": 0,
+    "Potassium": 0,
+    "temprature": 1,
+    "humidity": 1,
+    "ph": 2,
+    "rainfall": 1,
+}
+
+soil_cache = QuantizedLRUCache(
+    soil_fields,
+    soil_cache_precision,
+    maxsize=int(os.environ.get("SOIL_CACHE_SIZE", 4096)),
+)
 
+def predict_soil_classification_cached(data, model="xgb", engine="sklearn"):
+    """
+    predict_soil_classification behind the quantized LRU cache. On a miss the
+    request's own values are scored and the crop is cached under the quantized
+    key, so later requests within the same rounding reuse it.
+    """
     try:
-        soil_pred_xgb = predict_soil_classification(soil_data, model="xgb")
+        quantized = soil_cache.quantize([data[field] for field in soil_fields])
+    except KeyError as e:
+        raise ValueError(f"Missing required field: {e}")
+
+    key = (model,) + quantized
+    hit, crop = soil_cache.get(key)
+    if not hit:
+        crop = predict_soil_classification(data, model, engine)
+        soil_cache.put(key, crop)
+    return crop
+
+
+def soil_feature_matrix(records):
+    """
+    Build the Nx7 feature matrix from a list of soil dicts or an Nx7 array
+    """
+    if isinstance(records, np.ndarray):
+        features = records.astype(float, copy=False)
+    else:
+        try:
+            features = np.array([[float(r[field]) for field in soil_fields] for r in records], dtype=float)
+        except KeyError as e:
+            raise ValueError(f"Missing required field: {e}")
+
+    if features.size == 0:
+        features = features.reshape(0, len(soil_fields))
+    if features.ndim != 2 or features.shape[1] != len(soil_fields):
+        raise ValueError(f"Expected an Nx{len(soil_fields)} feature matrix, got shape {features.shape}")
+    return features
+
+
+def predict_soil_classification_batch(records, model="xgb", engine="sklearn"):
+    """
+    Predict crops for many soil samples with a single predict call.
+    Returns an array of crop names in input order.
+    engine="numpy" evaluates the RandomForest through tree_engine instead of sklearn.
+    """
+    features = soil_feature_matrix(records)
+    if len(features) == 0:
+        return crop_names[:0]
+
+    if model in ("xgb", "rfc"):
+        encoded_predictions = registry.get(model, engine).predict(features)
+    else:
+        raise ValueError("Invalid model choice: use 'xgb' or 'rfc'")
+
+    return crop_names[np.asarray(encoded_predictions, dtype=int)]
+
+
+# Default blend for model="ensemble"; weights need not sum to 1
+ensemble_weights = {"xgb": 0.5, "rfc": 0.5}
+
+_ensemble_pool = None
+_ensemble_pool_lock = threading.Lock()
+
+def _get_ensemble_pool():
+    global _ensemble_pool
+    with _ensemble_pool_lock:
+        if _ensemble_pool is None:
+            _ensemble_pool = ThreadPoolExecutor(max_workers=len(ensemble_weights), thread_name_prefix="soil-ensemble")
+    return _ensemble_pool
+
+
+def _class_proba(classifier, features):
+    """
+    predict_proba with columns aligned to encoded class index (crop_names order)
+    """
+    proba = np.zeros((len(features), len(crop_names)))
+    proba[:, np.asarray(classifier.classes_, dtype=int)] = classifier.predict_proba(features)
+    return proba
+
+
+def predict_soil_ensemble_proba(records, weights=None, engine="sklearn"):
+    """
+    Blend XGBC and RFC class probabilities for a list of soil dicts or an Nx7
+    array. Both models run concurrently in a thread pool (their native predict
+    code releases the GIL). engine applies to the RandomForest only.
+    Returns an N x len(crop_names) probability matrix.
+    """
+    weights = ensemble_weights if weights is None else weights
+    unknown = set(weights) - {"xgb", "rfc"}
+    if unknown:
+        raise ValueError(f"Invalid ensemble member(s) {sorted(unknown)}: use 'xgb' and/or 'rfc'")
+    total = float(sum(weights.values()))
+    if total <= 0:
+        raise ValueError("Ensemble weights must sum to a positive value")
+
+    features = soil_feature_matrix(records)
+    if len(features) == 0:
+        return np.zeros((0, len(crop_names)))
+
+    pool = _get_ensemble_pool()
+    futures = {
+        name: pool.submit(_class_proba, registry.get(name, engine if name == "rfc" else "sklearn"), features)
+        for name, weight in weights.items() if weight
+    }
+
+    blended = np.zeros((len(features), len(crop_names)))
+    for name, future in futures.items():
+        blended += weights[name] * future.result()
+    return blended / total
+
+
+def predict_soil_ensemble(records, weights=None, engine="sklearn"):
+    """
+    Ensemble crop prediction: one soil dict -> crop name, list/Nx7 array -> array of names
+    """
+    single = isinstance(records, dict)
+    proba = predict_soil_ensemble_proba([records] if single else records, weights, engine)
+    names = crop_names[np.argmax(proba, axis=1)]
+    return names[0] if single else names
+
+
+def predict_soil_top_k(records, k=3, model="xgb", engine="sklearn"):
+    """
+    Top-k crops with probabilities from a single predict_proba call.
+    Takes one soil dict (returns one ranking) or a list/Nx7 array (returns a
+    ranking per sample); each ranking is [{"crop", "score"}, ...] best first.
+    model="ensemble" ranks the blended XGBC/RFC probabilities.
+    """
+    single = isinstance(records, dict)
+    features = soil_feature_matrix([records] if single else records)
+
+    if model not in ("xgb", "rfc", "ensemble"):
+        raise ValueError("Invalid model choice: use 'xgb', 'rfc' or 'ensemble'")
+    try:
+        valid_k = not isinstance(k, bool) and int(k) == k and k >= 1
+    except (TypeError, ValueError):
+        valid_k = False
+    if not valid_k:
+        raise ValueError(f"Invalid k {k!r}: use a positive integer")
+
+    if len(features) == 0:
+        return []
+    if model == "ensemble":
+        proba = predict_soil_ensemble_proba(features, engine=engine)
+    else:
+        proba = _class_proba(registry.get(model, engine), features)
+
+    k = min(int(k), proba.shape[1])
+    # Unordered top-k per row in O(classes), then order just those k
+    top = np.argpartition(-proba, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(proba, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+    top_names = crop_names[top]
+    rankings = [
+        [{"crop": crop, "score": float(score)} for crop, score in zip(row_names, row_scores)]
+        for row_names, row_scores in zip(top_names.tolist(), top_scores.tolist())
+    ]
+    return rankings[0] if single else rankings
+
+
+def handle_request(soil_data):
+    """
+    Run one request through the stdin/stdout contract and return the result dict
+    """
+    try:
+        soil_pred_xgb = predict_soil_classification_cached(soil_data, model="xgb")
         # soil_pred_rfc = predict_soil_classification(soil_data, model="rfc")
 
         result = {"Prediction": soil_pred_xgb}
@@ -61,4 +258,43 @@ if __name__ == "__main__":
     except Exception as e:
         result = {"error": str(e)}
 
-    print(json.dumps(result))
+    return result
+
+
+def handle_batch_request(batch_data):
+    """
+    Batch counterpart of handle_request: {"records": [soil dicts]} -> {"Predictions": [crops]}
+    """
+    try:
+        predictions = predict_soil_classification_batch(batch_data["records"], model="xgb")
+        result = {"Predictions": predictions.tolist()}
+    except KeyError as e:
+        result = {"error": f"Missing required field: {e}"}
+    except Exception as e:
+        result = {"error": str(e)}
+
+    return result
+
+
+def handle_top_k_request(top_k_data):
+    """
+    {"records": [soil dicts], "k": 3} -> {"TopK": [[{"crop", "score"}, ...], ...]};
+    a bare soil dict (plus optional "k") returns a single ranking
+    """
+    try:
+        k = top_k_data.get("k", 3)
+        records = top_k_data["records"] if "records" in top_k_data else top_k_data
+        result = {"TopK": predict_soil_top_k(records, k=k, model="xgb")}
+    except KeyError as e:
+        result = {"error": f"Missing required field: {e}"}
+    except Exception as e:
+        result = {"error": str(e)}
+
+    return result
+
+
+if __name__ == "__main__":
+    input_str = sys.stdin.read()
+    soil_data = json.loads(input_str)
+
+    print(json.dumps(handle_request(soil_data)))
@@ -1,23 +1,28 @@
 import json
-import pickle
 import sys
 import numpy as np
 import os
 
-# Load models and encoder
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-
-model_path = os.path.join(BASE_DIR, "yield_prediction", "DecisionTreeRegression.pkl")
-DTR = pickle.load(open(model_path, "rb"))
+from registry import ModelRegistry
 
-# model_path = os.path.join(BASE_DIR, "yield_prediction", "RandomForestRegression.pkl")
-# RFR = pickle.load(open(model_path, "rb"))
+# Models and encoder are unpickled on first use, not at import
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Shared serving helpers (tree_engine) live one level up in models/
+sys.path.insert(1, os.path.dirname(BASE_DIR))
+registry = ModelRegistry(BASE_DIR, {
+    "xgb": os.path.join("yield_prediction", "XGBosstRegression.pkl"),
+    "dtr": os.path.join("yield_prediction", "DecisionTreeRegression.pkl"),
+    # "rfr": os.path.join("yield_prediction", "RandomForestRegression.pkl"),
+    "ct": os.path.join("yield_prediction", "OHEncoder.pkl"),
+})
 
-model_path = os.path.join(BASE_DIR, "yield_prediction", "XGBosstRegression.pkl")
-XGBR = pickle.load(open(model_path, "rb"))
+# Module attributes kept for callers that still reference the eager globals
+_registry_aliases = {"XGBR": "xgb", "DTR": "dtr", "ct": "ct"}
 
-model_path = os.path.join(BASE_DIR, "yield_prediction", "OHEncoder.pkl")
-ct = pickle.load(open(model_path, "rb"))
+def __getattr__(name):
+    if name in _registry_aliases:
+        return registry.get(_registry_aliases[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # trained colums
@@ -39,7 +44,10 @@ seasonsMap={
     'Whole Year':'Whole Year '
 }
 
-def predict_yield_prediction(data, model="xgb"):
+# Input fields in the column order the ColumnTransformer was fitted on
+yield_fields = ["Crop", "Season", "State", "Area", "Production", "Annual_Rainfall", "Fertilizer", "Pesticide"]
+
+def predict_yield_prediction(data, model="xgb", engine="sklearn"):
     try:
         features = [[
             data["Crop"],
@@ -52,14 +60,11 @@ def predict_yield_prediction(data, model="xgb"):
             data["Pesticide"]
         ]]
 
-        features_transformed = ct.transform(features)
-
-        if model == "xgb":
-            prediction = XGBR.predict(features_transformed)[0]
+        if model in ("xgb", "dtr"):
+            features_transformed = registry.get("ct").transform(features)
+            prediction = registry.get(model, engine).predict(features_transformed)[0]
         # elif model == "rfr":
-            # prediction = RFR.predict(features_transformed)[0]
-        elif model == "dtr":
-            prediction = DTR.predict(features_transformed)[0]
+            # prediction = registry.get("rfr").predict(features_transformed)[0]
         else:
             raise ValueError("Invalid model choice: use 'xgb' or 'rfr' or 'dtr'")
 
@@ -71,10 +76,59 @@ def predict_yield_prediction(data, model="xgb"):
         raise e
 
 
-if __name__ == "__main__":
-    input_str = sys.stdin.read()
-    yield_data = json.loads(input_str)
+def normalize_seasons(season_column):
+    """
+    Apply seasonsMap to a whole column, looking up each distinct season once.
+    Like the single-record path, only strings are mapped; None, NaN and other
+    non-string values pass through unchanged.
+    """
+    seasons = np.asarray(season_column, dtype=object)
+    is_string = np.fromiter((isinstance(season, str) for season in seasons), dtype=bool, count=len(seasons))
+    normalized = seasons.copy()
+    if is_string.any():
+        distinct, inverse = np.unique(seasons[is_string].astype(str), return_inverse=True)
+        mapped = np.array([seasonsMap.get(season, season) for season in distinct.tolist()], dtype=object)
+        normalized[is_string] = mapped[inverse.reshape(-1)]
+    return normalized
+
+
+def yield_feature_matrix(records):
+    """
+    Build the Nx8 object matrix ct expects from a list of yield dicts
+    """
+    features = np.empty((len(records), len(yield_fields)), dtype=object)
+    try:
+        for j, field in enumerate(yield_fields):
+            features[:, j] = [record[field] for record in records]
+    except KeyError as e:
+        raise ValueError(f"Missing required field: {e}")
+
+    if len(records):
+        features[:, 1] = normalize_seasons(features[:, 1])
+    return features
+
+
+def predict_yield_prediction_batch(records, model="xgb", engine="sklearn"):
+    """
+    Predict yields for many records with one ct.transform and one predict call.
+    Returns an array of predictions in input order.
+    engine="numpy" evaluates the DecisionTree through tree_engine instead of sklearn.
+    """
+    if model not in ("xgb", "dtr"):
+        raise ValueError("Invalid model choice: use 'xgb' or 'dtr'")
+
+    features = yield_feature_matrix(records)
+    if len(features) == 0:
+        return np.empty(0)
+
+    features_transformed = registry.get("ct").transform(features)
+    return registry.get(model, engine).predict(features_transformed)
 
+
+def handle_request(yield_data):
+    """
+    Run one request through the stdin/stdout contract and return the result dict
+    """
     try:
         # yield_pred_dtr = predict_yield_prediction(yield_data, model="dtr")
         # yield_pred_rfr = predict_yield_prediction(yield_data, model="rfr")
@@ -88,11 +142,33 @@ if __name__ == "__main__":
     except Exception as e:
         result = {"error": str(e)}
 
-    # To ensure JSON serializability of numpy types
-    def make_serializable(obj):
-        import numpy as np
-        if isinstance(obj, np.generic):
-            return obj.item()
-        raise TypeError(f"Type {type(obj)} not serializable")
+    return result
+
+
+def handle_batch_request(batch_data):
+    """
+    Batch counterpart of handle_request: {"records": [yield dicts]} -> {"Predictions": [yields]}
+    """
+    try:
+        predictions = predict_yield_prediction_batch(batch_data["records"], model="xgb")
+        result = {"Predictions": predictions.tolist()}
+    except KeyError as e:
+        result = {"error": f"Missing required field: {e}"}
+    except Exception as e:
+        result = {"error": str(e)}
+
+    return result
+
+
+# To ensure JSON serializability of numpy types
+def make_serializable(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Type {type(obj)} not serializable")
+
+
+if __name__ == "__main__":
+    input_str = sys.stdin.read()
+    yield_data = json.loads(input_str)
 
-    print(json.dumps(result, default=make_serializable))
+    print(json.dumps(handle_request(yield_data), default=make_serializable))
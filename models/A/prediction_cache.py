@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+
+
+class QuantizedLRUCache:
+    """
+    Bounded LRU cache keyed on a feature vector rounded to a per-field number
+    of decimals, so near-identical resubmissions share one entry.
+    """
+
+    def __init__(self, fields, precision, maxsize=4096):
+        self.fields = list(fields)
+        self.precision = [precision.get(field, 0) for field in self.fields]
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def quantize(self, values):
+        """
+        Round each value to its field's precision; the result is the cache key
+        """
+        return tuple(round(float(value), digits) for value, digits in zip(values, self.precision))
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
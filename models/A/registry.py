@@ -0,0 +1,108 @@
+import os
+import pickle
+import threading
+import time
+
+
+def current_rss_bytes():
+    """
+    Resident set size of this process, or None where /proc is unavailable
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ModelRegistry:
+    """
+    Resolves model names (e.g. 'xgb', 'rfc', 'dtr') to pickled artifacts and
+    unpickles each one only the first time it is requested.
+    """
+
+    def __init__(self, base_dir, artifacts):
+        self.base_dir = base_dir
+        self.artifacts = dict(artifacts)
+        self._models = {}
+        self._compiled = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def names(self):
+        return list(self.artifacts)
+
+    def path(self, name):
+        if name not in self.artifacts:
+            raise ValueError(f"Unknown model '{name}': use one of {', '.join(self.artifacts)}")
+        return os.path.join(self.base_dir, self.artifacts[name])
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def get(self, name, engine="sklearn"):
+        """
+        Loaded model by name. engine="numpy" returns the tree_engine-compiled
+        form instead (sklearn tree models only), compiled once and cached.
+        """
+        if engine == "numpy":
+            return self._get_compiled(name)
+        if engine != "sklearn":
+            raise ValueError(f"Invalid engine '{engine}': use 'sklearn' or 'numpy'")
+
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            if name not in self._models:
+                self._models[name] = self._load(name)
+        return self._models[name]
+
+    def _get_compiled(self, name):
+        compiled = self._compiled.get(name)
+        if compiled is not None:
+            return compiled
+
+        from tree_engine import compile_tree_model
+
+        model = self.get(name)
+        with self._lock:
+            if name not in self._compiled:
+                self._compiled[name] = compile_tree_model(model)
+        return self._compiled[name]
+
+    def _load(self, name):
+        model_path = self.path(name)
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        with open(model_path, "rb") as f:
+            model = pickle.load(f)
+        load_seconds = time.perf_counter() - start
+        rss_after = current_rss_bytes()
+
+        self._stats[name] = {
+            "path": model_path,
+            "file_bytes": os.path.getsize(model_path),
+            "load_seconds": load_seconds,
+            # RSS growth while unpickling; an estimate of the model's resident size
+            "rss_bytes": None if rss_before is None or rss_after is None else max(rss_after - rss_before, 0),
+        }
+        return model
+
+    def load_all(self, names=None):
+        for name in (names or self.names()):
+            self.get(name)
+
+    def stats(self):
+        """
+        Per-model load time and resident size; models not loaded yet report loaded=False
+        """
+        report = {}
+        for name in self.artifacts:
+            if name in self._stats:
+                report[name] = {"loaded": True, **self._stats[name]}
+            else:
+                report[name] = {"loaded": False, "path": self.path(name)}
+        return report
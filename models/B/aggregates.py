@@ -0,0 +1,179 @@
+import hashlib
+import io
+import os
+import pickle
+
+import pandas as pd
+
+import ingest
+import pipeline
+
+# Per-farm_type dashboard aggregates, persisted next to the survey file and
+# keyed by its sha256. When rows are only appended, just the new rows are
+# folded in; any other change rebuilds the store from scratch.
+
+AGGREGATE_METRICS = ['compliance_score', 'risk_score', 'chicken_disease_count', 'pig_disease_count',
+                     'antibiotic_variety']
+
+# Rows without a farm_type; the dashboards fill those with the most common
+# farm_type, so they are kept apart and folded into that group when read
+MISSING_FARM_TYPE = '__missing__'
+
+STORE_VERSION = 1
+
+# (store path, size, mtime) -> farm_type means, so dashboard reruns skip the pickle
+_means_memo = {}
+
+
+def store_path_for(data_path):
+    directory, name = os.path.split(os.path.abspath(data_path))
+    return os.path.join(directory, 'aggregate_cache', f'{name}.pkl')
+
+
+def _sha256(path, limit=None):
+    digest = hashlib.sha256()
+    remaining = limit
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(1 << 20 if remaining is None else min(1 << 20, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def group_stats(raw_df):
+    """
+    Per-farm_type sums and non-null counts of the dashboard metrics, plus the
+    raw farm_type value counts, for a block of survey rows
+    """
+    processed, _ = pipeline.preprocess_survey(raw_df)
+    farm_type = raw_df['farm_type'].loc[processed.index].astype(object)
+    key = farm_type.where(farm_type.notna(), MISSING_FARM_TYPE).rename('farm_type')
+
+    metrics = processed[AGGREGATE_METRICS].astype(float)
+    return {
+        'sums': metrics.groupby(key).sum(),
+        'counts': metrics.groupby(key).count(),
+        'farm_type_counts': farm_type.dropna().value_counts(),
+        'rows': len(processed),
+    }
+
+
+def _merge(stats, more):
+    return {
+        'sums': stats['sums'].add(more['sums'], fill_value=0),
+        'counts': stats['counts'].add(more['counts'], fill_value=0),
+        'farm_type_counts': stats['farm_type_counts'].add(more['farm_type_counts'], fill_value=0),
+        'rows': stats['rows'] + more['rows'],
+    }
+
+
+def _save(store, store_path):
+    os.makedirs(os.path.dirname(store_path), exist_ok=True)
+    tmp_path = f'{store_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(store, f)
+    os.replace(tmp_path, store_path)
+
+
+def _load(store_path):
+    try:
+        with open(store_path, 'rb') as f:
+            store = pickle.load(f)
+        return store if store.get('store_version') == STORE_VERSION else None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+
+
+def _appended_cleanly(data_path, offset):
+    # The aggregated bytes must end on a row boundary, or the first appended
+    # row would be glued onto the last aggregated one
+    with open(data_path, 'rb') as f:
+        f.seek(offset - 1)
+        return f.read(1) == b'\n'
+
+
+def _read_appended(data_path, offset):
+    # The header line plus everything after the bytes already aggregated,
+    # read through the same typed schema as a full rebuild
+    with open(data_path, 'rb') as f:
+        header = f.readline()
+        f.seek(offset)
+        tail = f.read()
+    return ingest.read_survey(io.BytesIO(header + tail))
+
+
+def refresh(data_path, store_path=None):
+    """
+    Bring the aggregate store for data_path up to date and return it
+    """
+    store_path = store_path or store_path_for(data_path)
+    stat = os.stat(data_path)
+    store = _load(store_path)
+
+    if store is not None and (store['size'], store['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+        return store
+
+    content_sha256 = _sha256(data_path)
+    if store is not None and store['content_sha256'] == content_sha256:
+        # Touched but unchanged
+        store.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+    elif (store is not None and stat.st_size > store['size'] and _appended_cleanly(data_path, store['size'])
+          and _sha256(data_path, store['size']) == store['content_sha256']):
+        # Rows appended: aggregate only the new ones
+        store['stats'] = _merge(store['stats'], group_stats(_read_appended(data_path, store['size'])))
+        store.update(content_sha256=content_sha256, size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+                     refresh='incremental')
+    else:
+        store = {
+            'store_version': STORE_VERSION,
+            'stats': group_stats(ingest.load_survey(data_path)),
+            'content_sha256': content_sha256,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'refresh': 'full',
+        }
+    _save(store, store_path)
+    return store
+
+
+def _fill_farm_type(stats):
+    # Same value load_data fills missing farm_types with: the most common one,
+    # the smallest on ties, 'Unknown' when there is none
+    counts = stats['farm_type_counts']
+    if counts.empty:
+        return 'Unknown'
+    return sorted(counts.index[counts == counts.max()])[0]
+
+
+def means_from_stats(stats):
+    """
+    {metric: DataFrame(farm_type, metric)}, as df.groupby('farm_type')[metric].mean().reset_index()
+    """
+    sums, counts = stats['sums'].copy(), stats['counts'].copy()
+    if MISSING_FARM_TYPE in sums.index:
+        fill = _fill_farm_type(stats)
+        for frame in (sums, counts):
+            missing = frame.loc[MISSING_FARM_TYPE]
+            frame.drop(index=MISSING_FARM_TYPE, inplace=True)
+            frame.loc[fill] = frame.loc[fill] + missing if fill in frame.index else missing
+
+    means = (sums / counts.where(counts > 0)).sort_index()
+    means.index.name = 'farm_type'
+    return {metric: means[metric].reset_index() for metric in AGGREGATE_METRICS}
+
+
+def farm_type_means(data_path, store_path=None):
+    """
+    Dashboard entry point: refreshed per-farm_type means for the survey file
+    """
+    store_path = store_path or store_path_for(data_path)
+    stat = os.stat(data_path)
+    memo_key = (store_path, stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _means_memo:
+        _means_memo.clear()
+        _means_memo[memo_key] = means_from_stats(refresh(data_path, store_path)['stats'])
+    return _means_memo[memo_key]
@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The dashboards' anomaly detector (StandardScaler + IsolationForest), fitted
+# by an explicit refit job and persisted, then only used for scoring:
+#   python3 anomaly.py refit --data Dataset.csv
+
+NUMERICAL_FEATURES = ['compliance_score', 'risk_score', 'years_farming',
+                      'chicken_disease_count', 'pig_disease_count', 'antibiotic_variety']
+
+DETECTOR_PATH = os.path.join(BASE_DIR, 'anomaly_detector.pkl')
+# Next to the detector file, shared with pipeline.py's model versions
+VERSIONS_DIR = 'model_versions'
+
+DETECTOR_PARAMS = {'contamination': 0.1, 'random_state': 42}
+
+# Loaded detector per path, and decision scores already computed per fitted
+# detector (version, fitted_at), keyed by a hash of the feature row: unchanged
+# farms are not rescored.
+# The scores are an LRU of at most SCORE_CACHE_SIZE rows.
+SCORE_CACHE_SIZE = int(os.environ.get('ANOMALY_SCORE_CACHE_SIZE', 100000))
+_detectors = {}
+_score_cache = {}
+_lock = threading.Lock()
+
+
+def feature_matrix(df, features=None):
+    features = [col for col in (features or NUMERICAL_FEATURES) if col in df.columns]
+    return df[features].fillna(0), features
+
+
+def fit_detector(df):
+    """
+    Fit the scaler and isolation forest on the preprocessed survey
+    """
+    from sklearn.ensemble import IsolationForest
+    from sklearn.preprocessing import StandardScaler
+
+    X, features = feature_matrix(df)
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    forest = IsolationForest(**DETECTOR_PARAMS)
+    forest.fit(X_scaled)
+    return {'scaler': scaler, 'forest': forest, 'features': features, 'rows': len(X)}
+
+
+def next_version(path=DETECTOR_PATH):
+    """
+    One past the current detector's version and the highest model_versions/anomaly-v<N>.pkl,
+    so a missing or moved detector file never reuses a version
+    """
+    versions = [0]
+    if os.path.exists(path):
+        versions.append(load_detector(path)['version'])
+    versions_dir = os.path.join(os.path.dirname(os.path.abspath(path)), VERSIONS_DIR)
+    if os.path.isdir(versions_dir):
+        for name in os.listdir(versions_dir):
+            stem, ext = os.path.splitext(name)
+            if ext == '.pkl' and stem.startswith('anomaly-v') and stem[len('anomaly-v'):].isdigit():
+                versions.append(int(stem[len('anomaly-v'):]))
+    return max(versions) + 1
+
+
+def save_detector(detector, path=DETECTOR_PATH):
+    """
+    Write the detector as the next version: the current file plus model_versions/anomaly-v<N>.pkl
+    """
+    versions_dir = os.path.join(os.path.dirname(os.path.abspath(path)), VERSIONS_DIR)
+    detector = dict(detector, version=next_version(path), fitted_at=time.time())
+
+    os.makedirs(versions_dir, exist_ok=True)
+    for target in [os.path.join(versions_dir, f"anomaly-v{detector['version']:04d}.pkl"), path]:
+        tmp_path = f'{target}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(detector, f)
+        os.replace(tmp_path, target)
+    return detector
+
+
+def load_detector(path=DETECTOR_PATH):
+    """
+    The persisted detector, reloaded only when the file changes
+    """
+    mtime = os.stat(path).st_mtime_ns
+    cached = _detectors.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            cached = _detectors[path] = (mtime, pickle.load(f))
+    return cached[1]
+
+
+def refit(data_path, path=DETECTOR_PATH):
+    """
+    The background refit job: preprocess the survey, fit, persist a new version
+    """
+    import ingest
+    import pipeline
+
+    df, _ = pipeline.preprocess_survey(ingest.load_survey(data_path))
+    return save_detector(fit_detector(df), path)
+
+
+def decision_scores(df, detector):
+    """
+    IsolationForest decision_function per row (negative = anomaly), computed
+    only for feature rows this fitted detector has not scored before
+    """
+    X, _ = feature_matrix(df, detector['features'])
+    keys = pd.util.hash_pandas_object(X, index=False).to_numpy()
+
+    # version and fit time together name one fitted artifact, even if a version number is ever reused
+    artifact = (detector.get('version'), detector.get('fitted_at'))
+    with _lock:
+        cache = _score_cache.setdefault(artifact, OrderedDict())
+        for key in [key for key in _score_cache if key != artifact]:
+            del _score_cache[key]
+        scores = np.array([cache.get(key, np.nan) for key in keys], dtype=np.float64)
+        for key in keys[~np.isnan(scores)]:
+            cache.move_to_end(key)
+
+    new = np.isnan(scores)
+    if new.any():
+        X_new = detector['scaler'].transform(X[new])
+        scores[new] = detector['forest'].decision_function(X_new)
+        with _lock:
+            cache.update(zip(keys[new], scores[new]))
+            while len(cache) > SCORE_CACHE_SIZE:
+                cache.popitem(last=False)
+    return scores
+
+
+def flag_anomalies(df, path=DETECTOR_PATH, data_path=None):
+    """
+    1 for anomalous farms, 0 otherwise, against the persisted detector. With no
+    detector on disk yet, one is fitted once (on data_path, or df itself).
+    """
+    if not os.path.exists(path):
+        if data_path:
+            refit(data_path, path)
+        else:
+            save_detector(fit_detector(df), path)
+    detector = load_detector(path)
+    return pd.Series((decision_scores(df, detector) < 0).astype(int), index=df.index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refit or inspect the persisted farm anomaly detector")
+    parser.add_argument("command", choices=["refit", "status"])
+    parser.add_argument("--data", default=os.path.join(BASE_DIR, 'Dataset.csv'), help="survey CSV to fit on")
+    parser.add_argument("--detector", default=DETECTOR_PATH, help="detector file")
+    args = parser.parse_args()
+
+    if args.command == "refit":
+        start = time.perf_counter()
+        detector = refit(args.data, args.detector)
+        report = {'version': detector['version'], 'rows': detector['rows'],
+                  'fit_seconds': time.perf_counter() - start}
+    else:
+        detector = load_detector(args.detector)
+        report = {'version': detector['version'], 'rows': detector['rows'],
+                  'features': detector['features'], 'fitted_at': detector['fitted_at']}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import featurize
+import modelB
+
+# Scores a whole file of farm survey records (same fields as a modelB request)
+# chunk by chunk:
+#   python3 bulk_score.py farms.csv --output scores.csv --workers 4
+
+
+def read_chunks(path, chunksize, columns=None):
+    """
+    Yield DataFrames of up to `chunksize` rows from a CSV or Parquet file,
+    reading only those of `columns` the file has (all columns when None)
+    """
+    if path.endswith('.parquet'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Reading Parquet needs pyarrow: pip install pyarrow")
+        parquet_file = pq.ParquetFile(path)
+        if columns is not None:
+            columns = [col for col in parquet_file.schema_arrow.names if col in set(columns)]
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        wanted = None if columns is None else set(columns)
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=None if wanted is None else lambda col: col in wanted)
+
+
+def score_chunk(df, model_path='model.pkl', engine='sklearn', keep_columns=()):
+    """
+    compliance/risk for every row of df, the way predict_from_json scores one record
+    """
+    model_data = modelB.load_model_data(model_path)
+    amu_features, bio_features, all_features = modelB.model_feature_columns(model_data, model_path)
+    amu_model = modelB.get_model(model_data, 'amu_model', model_path, engine)
+    bio_model = modelB.get_model(model_data, 'bio_model', model_path, engine)
+
+    X = modelB.preprocess_frame(df, all_features)
+    amu_proba = amu_model.predict_proba(X[amu_features].to_numpy(dtype=np.float64))
+    bio_proba = bio_model.predict_proba(X[bio_features].to_numpy(dtype=np.float64))
+
+    scores = df[list(keep_columns)].reset_index(drop=True)
+    scores['compliance'] = amu_proba.max(axis=1)
+    scores['risk'] = bio_proba.max(axis=1)
+    return scores
+
+
+def _score_in_worker(args):
+    df, model_path, engine, keep_columns = args
+    return score_chunk(df, model_path, engine, keep_columns)
+
+
+def score_file(path, chunksize=10000, workers=1, model_path='model.pkl', engine='sklearn', keep_columns=()):
+    """
+    Yield scored chunks in input order. With workers > 1 chunks are scored in a
+    process pool, with at most 2 chunks per worker in flight.
+    """
+    # Only the request fields the models featurize, plus the copied columns
+    chunks = read_chunks(path, chunksize, featurize.REQUEST_FIELDS + list(keep_columns))
+    if workers <= 1:
+        for df in chunks:
+            yield score_chunk(df, model_path, engine, keep_columns)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for df in chunks:
+            pending.append(pool.submit(_score_in_worker, (df, model_path, engine, keep_columns)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_scores(scored_chunks, out, output_format):
+    rows = 0
+    for i, scores in enumerate(scored_chunks):
+        if output_format == 'jsonl':
+            for record in scores.to_dict(orient='records'):
+                out.write(json.dumps(record, default=modelB.convert_np_int) + '\n')
+        else:
+            scores.to_csv(out, header=(i == 0), index=False)
+        out.flush()
+        rows += len(scores)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet file of farms with the AMU and biosecurity models")
+    parser.add_argument("input", help="CSV or .parquet file, one farm per row (modelB request fields)")
+    parser.add_argument("--output", help="output file (.csv or .jsonl), default: CSV on stdout")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="output format (default: from --output extension)")
+    parser.add_argument("--chunksize", type=int, default=10000, help="rows per chunk")
+    parser.add_argument("--workers", type=int, default=1, help="processes scoring chunks in parallel")
+    parser.add_argument("--keep", action="append", default=[],
+                        help="input column copied to the output, e.g. an ID (repeatable)")
+    parser.add_argument("--model", default="model.pkl", help="model file, relative to models/B")
+    parser.add_argument("--engine", choices=["sklearn", "numpy"], default="sklearn")
+    args = parser.parse_args()
+
+    output_format = args.format or ('jsonl' if (args.output or '').endswith('.jsonl') else 'csv')
+    start = time.perf_counter()
+    scored = score_file(args.input, args.chunksize, args.workers, args.model, args.engine, args.keep)
+    if args.output:
+        with open(args.output, 'w', newline='') as out:
+            rows = write_scores(scored, out, output_format)
+    else:
+        rows = write_scores(scored, sys.stdout, output_format)
+    print(f"scored {rows} farms in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
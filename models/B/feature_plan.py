@@ -0,0 +1,139 @@
+import threading
+
+import numpy as np
+
+import featurize
+from featurize import (CATEGORY_FIELDS, COMPLIANCE_FIELDS, ID_LIST_FIELDS, INT_FIELDS, KEYWORD_FIELDS,
+                       STORE_COLUMNS)
+
+# The field tables live in featurize and are shared with modelB.preprocess_input;
+# the plan produces exactly the values preprocess_input would put in those columns.
+# Both scores come from a scoring.ScoreEngine's weights, compiled into the plan.
+
+
+def producible_columns():
+    """
+    Every column name preprocess_input can emit
+    """
+    columns = [field for field, _, _ in CATEGORY_FIELDS] + INT_FIELDS + COMPLIANCE_FIELDS
+    for mapping in KEYWORD_FIELDS.values():
+        columns += [column for _, column in mapping]
+    columns += STORE_COLUMNS
+    for prefix, ids, count_column in ID_LIST_FIELDS.values():
+        columns += [f'{prefix}_{i}' for i in ids] + [count_column]
+    return columns + ['compliance_score', 'risk_score']
+
+
+class FeaturePlan:
+    """
+    modelB's featurization compiled against one model column order: every
+    producer knows the row index it writes to (or is skipped), and fill()
+    writes a request straight into a reused float64 row. The compliance and
+    risk weights of score_engine are compiled in alongside, so both scores
+    are accumulated while the row is filled.
+    """
+
+    def __init__(self, columns, score_engine):
+        self.columns = list(columns)
+        self.score_version = score_engine.version
+        self.index = {column: i for i, column in enumerate(self.columns)}
+        # Model columns no request can ever set; they always stay 0
+        self.unpopulated = [column for column in self.columns if column not in set(producible_columns())]
+
+        slot = self.index.get
+        # Per-column weights of the score engine (0 for columns it does not score)
+        compliance_weight = {column: score_engine.weights[score_engine.index[column], 0]
+                             for column in score_engine.compliance_columns}
+        risk_weight = {column: score_engine.weights[score_engine.index[column], 1]
+                       for column in score_engine.risk_columns}
+        self._compliance_denominator = score_engine.compliance_denominator
+        self._risk_denominator = score_engine.weights[:, 1].sum()
+
+        self._categories = [(field, mapping, default, slot(field)) for field, mapping, default in CATEGORY_FIELDS
+                            if field in self.index]
+        self._ints = [(field, slot(field)) for field in INT_FIELDS if field in self.index]
+        self._compliance = [(field, slot(field, -1), compliance_weight.get(field, 0))
+                            for field in COMPLIANCE_FIELDS]
+        self._keywords = [(field, [(keyword, slot(column, -1), risk_weight.get(column, 0))
+                                   for keyword, column in mapping])
+                          for field, mapping in KEYWORD_FIELDS.items()]
+        self._store = {column: (slot(column, -1), risk_weight.get(column, 0)) for column in STORE_COLUMNS}
+        self._id_lists = []
+        for field, (prefix, ids, count_column) in ID_LIST_FIELDS.items():
+            positions = {i: self.index[f'{prefix}_{i}'] for i in ids if f'{prefix}_{i}' in self.index}
+            self._id_lists.append((field, positions, slot(count_column, -1)))
+        self._compliance_score = slot('compliance_score', -1)
+        self._risk_score = slot('risk_score', -1)
+
+        self._local = threading.local()
+
+    def row(self):
+        """
+        This thread's reusable (1, n_columns) float64 row
+        """
+        row = getattr(self._local, 'row', None)
+        if row is None:
+            row = self._local.row = np.zeros((1, len(self.columns)), dtype=np.float64)
+        return row
+
+    def fill(self, raw_json, out=None):
+        """
+        Featurize one request into `out` (default: this thread's reused row,
+        overwritten by the next call) and return it
+        """
+        if hasattr(raw_json, 'to_dict'):
+            raw_json = raw_json.to_dict()
+        row = self.row() if out is None else out
+        row.fill(0.0)
+        values = row[0]
+
+        for field, mapping, default, i in self._categories:
+            values[i] = mapping.get(str(raw_json.get(field, 'Unknown')).lower(), default)
+        for field, i in self._ints:
+            values[i] = featurize.to_int_value(raw_json.get(field, 0))
+
+        compliance_sum = 0
+        for field, i, weight in self._compliance:
+            answer = featurize.yes_no_value(raw_json[field]) if field in raw_json else 0
+            compliance_sum += answer * weight
+            if i >= 0:
+                values[i] = answer
+
+        risk_sum = 0
+        for field, keywords in self._keywords:
+            if field not in raw_json:
+                continue
+            text = str(raw_json[field]).lower()
+            for keyword, i, weight in keywords:
+                if keyword in text:
+                    if i >= 0:
+                        values[i] = 1
+                    risk_sum += weight
+
+        store_column = featurize.match_store(raw_json['store']) if 'store' in raw_json else None
+        if store_column is not None:
+            i, weight = self._store[store_column]
+            if i >= 0:
+                values[i] = 1
+            risk_sum += weight
+
+        for field, positions, count_index in self._id_lists:
+            ids = featurize.parse_id_list(raw_json[field]) if field in raw_json else []
+            for identifier in ids:
+                try:
+                    i = positions.get(identifier)
+                except TypeError:
+                    continue
+                if i is not None:
+                    values[i] = 1
+            if count_index >= 0:
+                values[count_index] = len(ids)
+
+        if self._compliance_score >= 0:
+            values[self._compliance_score] = (compliance_sum / self._compliance_denominator) * 100
+        if self._risk_score >= 0:
+            values[self._risk_score] = (risk_sum / self._risk_denominator) * 100
+        return row
+
+    def describe(self):
+        return {'columns': len(self.columns), 'unpopulated': self.unpopulated, 'score_version': self.score_version}
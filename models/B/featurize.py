@@ -0,0 +1,263 @@
+import ast
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+# Column-at-a-time building blocks for featurizing whole DataFrames of survey
+# records. Each helper reproduces, for a full column, what the per-record
+# preprocess_input functions in model2.py and modelB.py do to a single value.
+
+YES_ANSWERS = ['yes', 'y', 'true', '1', 'agree']
+
+# int() accepts surrounding whitespace and a sign, nothing else we expect in surveys
+_INT_STRING = r'\s*[+-]?\d+\s*'
+
+
+def column(df, name, default):
+    """
+    df[name], or a column filled with `default` when the field is absent
+    """
+    if name in df.columns:
+        return df[name]
+    return pd.Series([default] * len(df), index=df.index, dtype=object)
+
+
+def _is_str(series):
+    if pd.api.types.is_string_dtype(series.dtype) and series.dtype != object:
+        return series.notna()
+    return series.map(lambda value: isinstance(value, str)).astype(bool)
+
+
+def lower_strings(series):
+    """
+    str(value).lower() for every value, the way the scalar paths stringify fields
+    """
+    return series.map(str).str.lower()
+
+
+def to_int(series):
+    """
+    int(value) per value, falling back to 0 where int() would raise
+    """
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return series.astype(np.int64)
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        values = series.to_numpy(dtype=float)
+        return pd.Series(np.where(np.isfinite(values), np.trunc(values), 0).astype(np.int64), index=series.index)
+
+    is_str = _is_str(series)
+    strings = series.where(is_str).astype(object)
+    string_ok = is_str & strings.str.fullmatch(_INT_STRING).fillna(False).astype(bool)
+    numbers = pd.to_numeric(series.where(~is_str), errors='coerce').to_numpy(dtype=float)
+
+    result = np.where(np.isfinite(numbers), np.trunc(numbers), 0).astype(np.int64)
+    if string_ok.any():
+        result[string_ok.to_numpy()] = strings[string_ok].astype(str).str.strip().astype(np.int64).to_numpy()
+    return pd.Series(result, index=series.index)
+
+
+def yes_no_to_binary(series):
+    """
+    modelB compliance answers: numbers are 1 only when == 1, strings are 1 when
+    they are a yes-like answer, anything else is 0
+    """
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return pd.Series((series.to_numpy(dtype=float) == 1).astype(np.int64), index=series.index)
+
+    is_str = _is_str(series)
+    result = np.zeros(len(series), dtype=np.int64)
+    if is_str.any():
+        answers = series[is_str].astype(str).str.lower().str.strip()
+        result[is_str.to_numpy()] = answers.isin(YES_ANSWERS).to_numpy()
+    if (~is_str).any():
+        others = series[~is_str]
+        is_number = others.map(lambda value: isinstance(value, (int, float, np.integer, np.floating))).astype(bool)
+        numbers = pd.to_numeric(others.where(is_number), errors='coerce')
+        result[(~is_str).to_numpy()] = (numbers == 1).to_numpy()
+    return pd.Series(result, index=series.index)
+
+
+def encode_category(series, mapping, default):
+    """
+    mapping.get(str(value).lower(), default) for every value
+    """
+    return lower_strings(series).map(mapping).fillna(default).astype(np.int64)
+
+
+def parse_id_list(value):
+    """
+    One disease/antibiotic cell as the scalar paths read it: a list as-is, a
+    string parsed as a Python literal list/tuple/set (never evaluated, the
+    cells come from uploaded files), anything else empty
+    """
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str):
+        try:
+            parsed = ast.literal_eval(value)
+        except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+            return []
+        return parsed if isinstance(parsed, (list, tuple, set)) else []
+    return []
+
+
+# modelB request schema: the one copy of the field tables used by
+# modelB.preprocess_input, modelB.preprocess_frame and feature_plan.FeaturePlan
+
+DEMOGRAPHIC_FIELDS = ['gender', 'age', 'education', 'farm_type', 'years_farming']
+
+GENDER_MAP = {'male': 0, 'female': 1, 'unknown': 2}
+EDUCATION_MAP = {'none': 0, 'primary': 1, 'secondary': 2, 'tertiary': 3, 'unknown': 4}
+FARM_TYPE_MAP = {'small': 0, 'medium': 1, 'large': 2, 'unknown': 3}
+
+# (field, mapping of the lowercased value, code for anything else)
+CATEGORY_FIELDS = [('gender', GENDER_MAP, 2), ('education', EDUCATION_MAP, 4), ('farm_type', FARM_TYPE_MAP, 3)]
+INT_FIELDS = ['age', 'years_farming']
+
+COMPLIANCE_FIELDS = [
+    'follow_prescription', 'check_expiry', 'increase_dosage', 'improvement_stop',
+    'misuse_amr', 'training_usage', 'consult_veterinan', 'amr_is_problem',
+    'regulations', 'withdraw', 'importance_withdraw'
+]
+
+# field -> [(keyword, column)], every keyword found in the lowercased value sets its column
+KEYWORD_FIELDS = {
+    'e_dispose': [('return', 'e_dispose_return'), ('incineration', 'e_dispose_Incineration'),
+                  ('waste', 'e_dispose_as_waste'), ('field', 'e_dispose_field')],
+    'p_dispose': [('return', 'p_dispose_Reuse'), ('incineration', 'p_dispose_Incineration'),
+                  ('waste', 'p_dispose_as_waste'), ('field', 'p_dispose_field')],
+    'manure_mngt': [('composting', 'manure_mngt_composting'), ('fields', 'manure_mngt_fields'),
+                    ('storing', 'manure_mngt_Storing'), ('landfill', 'manure_mngt_landfill')],
+}
+
+# Storage is matched with spaces removed and only the first matching keyword counts
+STORE_KEYWORDS = [
+    ('lessthan1week', 'store_lessweek'), ('lessweek', 'store_lessweek'),
+    ('1-2weeks', 'store_1-2 weeks'), ('1-2 weeks', 'store_1-2 weeks'),
+    ('morethan2weeks', 'store_morethan2'), ('morethan2', 'store_morethan2'),
+    ('dontstore', 'store_dont_store'), ('dont_store', 'store_dont_store')
+]
+STORE_COLUMNS = list(dict.fromkeys(column for _, column in STORE_KEYWORDS))
+
+# field -> (one-hot column prefix, known IDs, count column)
+ID_LIST_FIELDS = {
+    'disease_chicken': ('disease_chicken', range(1, 9), 'chicken_disease_count'),
+    'disease_pig': ('disease_pig', range(1, 12), 'pig_disease_count'),
+    'antibiotics_used': ('used', range(1, 23), 'antibiotic_variety'),
+}
+
+# Every request field the featurization reads
+REQUEST_FIELDS = DEMOGRAPHIC_FIELDS + COMPLIANCE_FIELDS + list(KEYWORD_FIELDS) + ['store'] + list(ID_LIST_FIELDS)
+
+
+def to_int_value(value):
+    """
+    int(value), 0 where int() raises
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+
+def yes_no_value(value):
+    """
+    One compliance answer: numbers are 1 only when == 1, strings when yes-like, anything else 0
+    """
+    if isinstance(value, (int, float)):
+        return 1 if value == 1 else 0
+    if isinstance(value, str):
+        return 1 if value.lower().strip() in YES_ANSWERS else 0
+    return 0
+
+
+def match_store(value):
+    """
+    The store_* column a storage answer sets, or None
+    """
+    text = str(value).lower().replace(' ', '')
+    for keyword, column_name in STORE_KEYWORDS:
+        if keyword in text:
+            return column_name
+    return None
+
+
+def _id_position(position, identifier):
+    try:
+        return position.get(identifier, -1)
+    except TypeError:
+        return -1
+
+
+# Multi-hot survey flags (diseases, antibiotics) are kept as packed bitsets:
+# one uint64 word per 64 flags, bit j of a row set when the j-th flag is.
+# pipeline.preprocess_survey stores them this way; counts are popcounts and
+# cohort filters are masks over the words.
+
+def _n_words(n_bits):
+    return max(1, (n_bits + 63) // 64)
+
+
+def pack_flags(flags):
+    """
+    (n_rows, n_bits) matrix of 0/1 flags (NaN counts as 0) -> (n_rows, n_words) uint64 bitsets
+    """
+    flags = np.asarray(flags, dtype=float)
+    n_rows, n_bits = flags.shape
+    padded = np.zeros((n_rows, _n_words(n_bits) * 64), dtype=bool)
+    padded[:, :n_bits] = np.nan_to_num(flags) != 0
+    return np.packbits(padded, axis=1, bitorder='little').view('<u8').astype(np.uint64)
+
+
+def popcount(bits):
+    """
+    Number of set bits per row
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bits).sum(axis=1, dtype=np.int64)
+    as_bytes = np.ascontiguousarray(bits, dtype='<u8').view(np.uint8)
+    return np.unpackbits(as_bytes, axis=1).sum(axis=1, dtype=np.int64)
+
+
+def bit_mask(positions, n_bits):
+    """
+    (n_words,) uint64 mask with the given bit positions set, for cohort filters
+    """
+    mask = np.zeros(_n_words(n_bits), dtype=np.uint64)
+    for position in positions:
+        mask[position >> 6] |= np.uint64(1) << np.uint64(position & 63)
+    return mask
+
+
+def has_any(bits, mask):
+    """
+    Rows with at least one of the mask's bits set
+    """
+    return (bits & mask).any(axis=1)
+
+
+def has_all(bits, mask):
+    """
+    Rows with every one of the mask's bits set
+    """
+    return ((bits & mask) == mask).all(axis=1)
+
+
+def multi_hot(series, ids):
+    """
+    Expand a column of ID lists into a 0/1 matrix with one column per ID in
+    `ids`, plus the length of each list. Returns (matrix, counts).
+    """
+    lists = [parse_id_list(value) for value in series]
+    counts = np.fromiter(map(len, lists), dtype=np.int64, count=len(lists))
+
+    position = {identifier: j for j, identifier in enumerate(ids)}
+    flat = list(chain.from_iterable(lists))
+    rows = np.repeat(np.arange(len(lists)), counts)
+    cols = np.fromiter((_id_position(position, identifier) for identifier in flat), dtype=np.int64, count=len(flat))
+
+    matrix = np.zeros((len(lists), len(ids)), dtype=np.int64)
+    known = cols >= 0
+    matrix[rows[known], cols[known]] = 1
+    return matrix, counts
@@ -0,0 +1,331 @@
+import argparse
+import json
+import math
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+
+import ingest
+import pipeline
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Proximity queries over the surveyed farms ("which farms are within 5 km of
+# this outbreak", "the 10 farms nearest this one"), answered from a haversine
+# BallTree built from the ingested survey and cached next to the typed survey
+# in ingest_cache/:
+#   python3 geo.py within --lat -15.64 --lon 35.01 --radius-km 5
+#   python3 geo.py nearest --farm 123456 --k 10
+
+EARTH_RADIUS_KM = 6371.0088
+INDEX_VERSION = 1
+
+# Per-farm values returned with every match
+FARM_FIELDS = ['risk_score', 'compliance_score', 'high_risk', 'non_compliant']
+
+# data path -> ((size, mtime_ns), FarmIndex) of the last index loaded for it
+_indexes = {}
+# data path -> ((size, mtime_ns), error) of the last failed build, so an unusable
+# survey is not re-read on every call until the file changes
+_failures = {}
+_lock = threading.Lock()
+
+
+def farm_coordinates(df):
+    """
+    (latitude, longitude) per farm in degrees: the recorded point, or the
+    survey app's GPS fix where that is missing (or the survey has no recorded
+    point columns). NaN when neither is usable.
+    """
+    if 'latitude' in df.columns and 'longitude' in df.columns:
+        lat = df['latitude'].to_numpy(dtype=np.float64, copy=True)
+        lon = df['longitude'].to_numpy(dtype=np.float64, copy=True)
+    else:
+        lat = np.full(len(df), np.nan)
+        lon = np.full(len(df), np.nan)
+    if '_Location_latitude' in df.columns and '_Location_longitude' in df.columns:
+        missing = np.isnan(lat) | np.isnan(lon)
+        lat[missing] = df['_Location_latitude'].to_numpy(dtype=np.float64)[missing]
+        lon[missing] = df['_Location_longitude'].to_numpy(dtype=np.float64)[missing]
+    invalid = (np.abs(lat) > 90) | (np.abs(lon) > 180)
+    lat[invalid] = np.nan
+    lon[invalid] = np.nan
+    return lat, lon
+
+
+class FarmIndex:
+    """
+    BallTree (haversine) over the farms with coordinates, plus their farm ID,
+    farm_type and scores for the results
+    """
+
+    def __init__(self, df):
+        from sklearn.neighbors import BallTree
+
+        lat, lon = farm_coordinates(df)
+        located = ~(np.isnan(lat) | np.isnan(lon))
+        if not located.any():
+            raise ValueError("No farm in the survey has usable coordinates")
+        self.latitude = lat[located]
+        self.longitude = lon[located]
+        if '_id' in df.columns:
+            self.farm_id = df['_id'].to_numpy()[located]
+        else:
+            self.farm_id = np.flatnonzero(located)
+        self.farm_type = df['farm_type'].astype(object).to_numpy()[located]
+        self.fields = {field: df[field].to_numpy()[located] for field in FARM_FIELDS if field in df.columns}
+        self.unlocated = int((~located).sum())
+        self._row = {farm_id: i for i, farm_id in enumerate(self.farm_id.tolist())}
+        self.tree = BallTree(np.radians(np.column_stack([self.latitude, self.longitude])), metric='haversine')
+
+    def __len__(self):
+        return len(self.farm_id)
+
+    def _point(self, latitude, longitude):
+        return np.radians([[latitude, longitude]])
+
+    def farm_location(self, farm_id):
+        """
+        (latitude, longitude) of a farm by its survey _id
+        """
+        if farm_id not in self._row:
+            raise KeyError(f"No located farm with id {farm_id}")
+        i = self._row[farm_id]
+        return self.latitude[i], self.longitude[i]
+
+    def within(self, latitude, longitude, radius_km):
+        """
+        (rows, distances_km) of every farm within radius_km, nearest first
+        """
+        rows, distances = self.tree.query_radius(self._point(latitude, longitude), r=radius_km / EARTH_RADIUS_KM,
+                                                 return_distance=True, sort_results=True)
+        return rows[0], distances[0] * EARTH_RADIUS_KM
+
+    def nearest(self, latitude, longitude, k):
+        """
+        (rows, distances_km) of the k nearest farms, nearest first
+        """
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        distances, rows = self.tree.query(self._point(latitude, longitude), k=k)
+        return rows[0], distances[0] * EARTH_RADIUS_KM
+
+    def records(self, rows, distances_km):
+        """
+        One dict per matched farm: ID, farm_type, location, distance and scores (NaN as None)
+        """
+        columns = {
+            'farm_id': self.farm_id[rows].tolist(),
+            'farm_type': self.farm_type[rows].tolist(),
+            'latitude': self.latitude[rows].tolist(),
+            'longitude': self.longitude[rows].tolist(),
+            'distance_km': distances_km.tolist(),
+        }
+        for field, values in self.fields.items():
+            values = values[rows].tolist()
+            if self.fields[field].dtype.kind == 'f':
+                values = [None if math.isnan(value) else value for value in values]
+            columns[field] = values
+        names = list(columns)
+        return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+    def describe(self):
+        return {'farms': len(self), 'unlocated': self.unlocated, 'index_version': INDEX_VERSION}
+
+
+def index_path_for(data_path):
+    # Same content key as the ingest cache, so the index is rebuilt exactly when the survey changes
+    return os.path.splitext(ingest.cache_path_for(data_path))[0] + '.geo.pkl'
+
+
+def build_index(data_path):
+    """
+    Ingest and preprocess the survey, then index every located farm
+    """
+    df, _ = pipeline.preprocess_survey(ingest.load_survey(data_path))
+    return FarmIndex(df)
+
+
+def load_index(data_path=os.path.join(BASE_DIR, 'Dataset.csv')):
+    """
+    The FarmIndex for data_path: in memory while the file is unchanged, else
+    from the ingest cache, else built (and cached) from the survey. Raises
+    RuntimeError when it cannot be built; that is remembered until the file
+    changes, so callers can treat the index as optional.
+    """
+    stat = os.stat(data_path)
+    key = (stat.st_size, stat.st_mtime_ns)
+    cached = _indexes.get(data_path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    failed = _failures.get(data_path)
+    if failed is not None and failed[0] == key:
+        raise RuntimeError(f"Farm index unavailable: {failed[1]}")
+
+    with _lock:
+        cached = _indexes.get(data_path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        failed = _failures.get(data_path)
+        if failed is not None and failed[0] == key:
+            raise RuntimeError(f"Farm index unavailable: {failed[1]}")
+
+        try:
+            index = _read_or_build(data_path)
+        except Exception as e:
+            _failures[data_path] = (key, f"{type(e).__name__}: {e}")
+            raise RuntimeError(f"Farm index unavailable: {_failures[data_path][1]}") from e
+
+        _indexes[data_path] = (key, index)
+        _failures.pop(data_path, None)
+        return index
+
+
+def _sklearn_version():
+    # A pickled BallTree is only safe to reuse with the sklearn that wrote it
+    import sklearn
+    return sklearn.__version__
+
+
+def _read_or_build(data_path):
+    index_path = index_path_for(data_path)
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, 'rb') as f:
+                stored = pickle.load(f)
+            if stored.get('index_version') == INDEX_VERSION and stored.get('sklearn') == _sklearn_version():
+                return stored['index']
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+
+    index = build_index(data_path)
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    tmp_path = f'{index_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'index_version': INDEX_VERSION, 'sklearn': _sklearn_version(), 'index': index}, f)
+    os.replace(tmp_path, index_path)
+    return index
+
+
+def index_status(data_path=os.path.join(BASE_DIR, 'Dataset.csv')):
+    """
+    For serve.py /health: the index's describe() plus available=True, or
+    available=False and the error; a failed build is not retried here
+    """
+    try:
+        return dict(load_index(data_path).describe(), available=True)
+    except (OSError, RuntimeError) as e:
+        return {'available': False, 'error': str(e)}
+
+
+def farms_near(latitude=None, longitude=None, farm_id=None, radius_km=None, k=None,
+               data_path=os.path.join(BASE_DIR, 'Dataset.csv')):
+    """
+    Farms within radius_km of a point (or of farm_id's location), or its k
+    nearest farms; with both, the k nearest within the radius. A query by
+    farm_id leaves that farm out of the results.
+    """
+    if radius_km is None and k is None:
+        raise ValueError("Give radius_km, k or both")
+    index = load_index(data_path)
+    if farm_id is not None:
+        latitude, longitude = index.farm_location(farm_id)
+    elif latitude is None or longitude is None:
+        raise ValueError("Give latitude and longitude, or farm_id")
+
+    if radius_km is not None:
+        rows, distances = index.within(latitude, longitude, radius_km)
+    else:
+        # One extra, in case the query farm itself is among them
+        rows, distances = index.nearest(latitude, longitude, k + (farm_id is not None))
+
+    if farm_id is not None:
+        keep = index.farm_id[rows] != farm_id
+        rows, distances = rows[keep], distances[keep]
+    if k is not None:
+        rows, distances = rows[:k], distances[:k]
+    return index.records(rows, distances)
+
+
+def _number(payload, field, low, high=None):
+    # A JSON number within [low, high], or None when the field is absent
+    value = payload.get(field)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"'{field}' must be a number")
+    if value < low or (high is not None and value > high):
+        raise ValueError(f"'{field}' must be between {low} and {high}" if high is not None
+                         else f"'{field}' must be at least {low}")
+    return value
+
+
+def parse_request(payload):
+    """
+    farms_near keyword arguments from a /B/nearby payload; ValueError on a bad one
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Expected a JSON object")
+    args = {
+        'latitude': _number(payload, 'latitude', -90, 90),
+        'longitude': _number(payload, 'longitude', -180, 180),
+        'farm_id': payload.get('farm_id'),
+        'radius_km': _number(payload, 'radius_km', 0),
+        'k': payload.get('k'),
+    }
+    if args['farm_id'] is not None and (isinstance(args['farm_id'], bool) or not isinstance(args['farm_id'], int)):
+        raise ValueError("'farm_id' must be an integer survey _id")
+    if args['k'] is not None and (isinstance(args['k'], bool) or not isinstance(args['k'], int) or args['k'] < 1):
+        raise ValueError("'k' must be a positive integer")
+    if args['radius_km'] is None and args['k'] is None:
+        raise ValueError("Give radius_km, k or both")
+    if args['farm_id'] is None and (args['latitude'] is None or args['longitude'] is None):
+        raise ValueError("Give latitude and longitude, or farm_id")
+    return args
+
+
+def handle_request(payload):
+    """
+    serve.py /B/nearby: {"latitude", "longitude"} or {"farm_id"}, plus "radius_km"
+    and/or "k". Bad requests, unknown farms and a missing index give {"error"}.
+    """
+    try:
+        farms = farms_near(**parse_request(payload))
+    except KeyError as e:
+        return {'error': e.args[0]}
+    except (ValueError, RuntimeError, OSError) as e:
+        return {'error': str(e)}
+    return {'count': len(farms), 'farms': farms}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find surveyed farms near a point or another farm")
+    parser.add_argument("command", choices=["within", "nearest", "status"])
+    parser.add_argument("--lat", type=float, help="latitude of the query point")
+    parser.add_argument("--lon", type=float, help="longitude of the query point")
+    parser.add_argument("--farm", type=int, help="query around this farm (_id) instead of a point")
+    parser.add_argument("--radius-km", type=float, default=5.0, help="radius for 'within'")
+    parser.add_argument("--k", type=int, default=10, help="number of farms for 'nearest'")
+    parser.add_argument("--data", default=os.path.join(BASE_DIR, 'Dataset.csv'), help="survey CSV")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        start = time.perf_counter()
+        report = dict(load_index(args.data).describe(), load_seconds=time.perf_counter() - start)
+    else:
+        load_index(args.data)
+        start = time.perf_counter()
+        farms = farms_near(args.lat, args.lon, args.farm,
+                           radius_km=args.radius_km if args.command == "within" else None,
+                           k=args.k if args.command == "nearest" else None,
+                           data_path=args.data)
+        report = {'count': len(farms), 'query_seconds': time.perf_counter() - start, 'farms': farms}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import hashlib
+import os
+import pickle
+import re
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Typed, column-projected reading of the survey CSV. Only the column families
+# the pipeline uses are read, each with a compact dtype, and the result is
+# cached in a columnar file (Parquet with pyarrow, pickle otherwise) keyed by
+# the CSV's sha256 and the schema version.
+
+SCHEMA_VERSION = 3
+
+CATEGORY_COLUMNS = [
+    'consent', 'gender', 'age', 'education', 'farm_type',
+    # Compliance answers ('Yes' / 'No' / "I don't know")
+    'follow_prescription', 'check_expiry', 'increase_dosage', 'improvement_stop',
+    'misuse_amr', 'training_usage', 'consult_veterinan', 'amr_is_problem',
+    'regulations', 'withdraw', 'importance_withdraw'
+]
+FLOAT_COLUMNS = [
+    'years_farming',
+    # Farm geolocation: the recorded point, and the survey app's GPS fix (see geo.py)
+    'latitude', 'longitude', '_Location_latitude', '_Location_longitude'
+]
+# Survey submission ID, used to name farms in proximity queries
+ID_COLUMNS = ['_id']
+
+# 0/1 practice flags feeding the risk score; a missing answer (NaN) must stay
+# NaN there, so they are float32 rather than uint8
+RISK_FLAG_PREFIXES = ('e_dispose_', 'p_dispose_', 'manure_mngt_', 'store_')
+# 0/1 multi-hot flags that are only ever counted (NaN counts as 0)
+COUNT_FLAG_PREFIXES = ('disease', 'used_')
+
+CHUNKSIZE = 50000
+
+
+def column_family(name):
+    """
+    Schema entry for a CSV column: 'category', 'float', 'id', 'risk_flag', 'count_flag' or None (not read)
+    """
+    if name in CATEGORY_COLUMNS:
+        return 'category'
+    if name in FLOAT_COLUMNS:
+        return 'float'
+    if name in ID_COLUMNS:
+        return 'id'
+    if name.startswith(RISK_FLAG_PREFIXES):
+        return 'risk_flag'
+    if name.lower().startswith(COUNT_FLAG_PREFIXES):
+        return 'count_flag'
+    return None
+
+
+def _typed_chunk(chunk):
+    for col in chunk.columns:
+        family = column_family(col)
+        if family == 'category':
+            chunk[col] = chunk[col].astype('category')
+        elif family == 'float':
+            # float64 even when a chunk has no gaps, so every block of rows types alike
+            chunk[col] = pd.to_numeric(chunk[col], errors='coerce').astype(np.float64)
+        elif family == 'id':
+            chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+        elif family == 'risk_flag':
+            chunk[col] = pd.to_numeric(chunk[col], errors='coerce').astype(np.float32)
+        elif family == 'count_flag':
+            chunk[col] = (pd.to_numeric(chunk[col], errors='coerce').fillna(0) != 0).astype(np.uint8)
+    return chunk
+
+
+def _concat(chunks):
+    if len(chunks) == 1:
+        return chunks[0]
+    df = pd.concat(chunks, ignore_index=True)
+    # Chunks see different category sets; union them instead of falling back to object
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            df[col] = union_categoricals([chunk[col] for chunk in chunks]).astype('category')
+    return df
+
+
+def read_survey(path, chunksize=CHUNKSIZE):
+    """
+    Read only the schema's columns from the survey CSV (a path or a binary
+    file object), chunk by chunk, in compact dtypes
+    """
+    chunks = [
+        _typed_chunk(chunk)
+        for chunk in pd.read_csv(path, usecols=lambda col: column_family(col) is not None,
+                                 dtype={col: str for col in CATEGORY_COLUMNS}, chunksize=chunksize)
+    ]
+    if not chunks:
+        if hasattr(path, 'seek'):
+            path.seek(0)
+        return _typed_chunk(pd.read_csv(path, usecols=lambda col: column_family(col) is not None, nrows=0))
+    return _concat(chunks)
+
+
+def _cache_format():
+    try:
+        import pyarrow  # noqa: F401
+        return 'parquet'
+    except ImportError:
+        return 'pkl'
+
+
+def cache_path_for(path):
+    digest = hashlib.sha256(f'schema-v{SCHEMA_VERSION}'.encode())
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    directory, name = os.path.split(os.path.abspath(path))
+    stem = os.path.splitext(name)[0]
+    return os.path.join(directory, 'ingest_cache', f'{stem}-{digest.hexdigest()[:16]}.{_cache_format()}')
+
+
+def remove_stale(cache_path):
+    """
+    Delete the cache entries (and derived files such as geo.py's index) left
+    by earlier contents or schema versions of the same survey file
+    """
+    directory, name = os.path.split(cache_path)
+    stem, digest = re.fullmatch(r'(.*)-([0-9a-f]{16})\.[^.]+', name).groups()
+    stale = re.compile(re.escape(stem) + r'-(?!' + digest + r'\.)[0-9a-f]{16}\..+')
+    for entry in os.listdir(directory):
+        if stale.fullmatch(entry) and not entry.endswith('.tmp'):
+            try:
+                os.remove(os.path.join(directory, entry))
+            except OSError:
+                pass
+
+
+def load_survey(path, use_cache=True):
+    """
+    read_survey(path), served from the columnar cache when the CSV is unchanged
+    """
+    if not use_cache:
+        return read_survey(path)
+
+    cache_path = cache_path_for(path)
+    if os.path.exists(cache_path):
+        try:
+            if cache_path.endswith('.parquet'):
+                return pd.read_parquet(cache_path)
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            # Unreadable cache: rebuild it below
+            pass
+
+    df = read_survey(path)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    if cache_path.endswith('.parquet'):
+        df.to_parquet(tmp_path, index=False)
+    else:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(df, f)
+    os.replace(tmp_path, cache_path)
+    remove_stale(cache_path)
+    return df
@@ -476,6 +476,9 @@ import pandas as pd
 import numpy as np
 import warnings
 import os
+import hashlib
+import pickle
+import sklearn
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
@@ -483,8 +486,26 @@ from sklearn.metrics import accuracy_score
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 
+import featurize
+import scoring
+
 warnings.filterwarnings('ignore')
 
+# Everything that changes the fitted models besides the dataset itself; part of
+# the artifact cache key
+TRAINING_PARAMS = {
+    'n_estimators': 100,
+    'random_state': 42,
+    'test_size': 0.2,
+    'high_risk_quantile': 0.75,
+    'non_compliant_quantile': 0.25,
+}
+
+ARTIFACT_DIR = os.environ.get(
+    'MODEL2_ARTIFACT_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model2_artifacts')
+)
+
 disease_chicken_map = {
     1: 'Newcastle',
     2: 'Infectious Bursal',
@@ -539,33 +560,8 @@ gender_map = {'male': 0, 'female': 1, 'unknown': 2, 'Unknown': 2}
 education_map = {'none': 0, 'primary': 1, 'secondary': 2, 'tertiary': 3, 'Unknown': 4, 'unknown': 4}
 farm_type_map = {'small': 0, 'medium': 1, 'large': 2, 'Unknown': 3, 'unknown': 3}
 
-# Antibiotic disposal practices
-disposal_columns_weights = {
-    'e_dispose_return': 1,
-    'e_dispose_incineration': 1,
-    'e_dispose_waste': 2,
-    'e_dispose_field': 2,
-    'p_dispose_return': 1,
-    'p_dispose_incineration': 1,
-    'p_dispose_waste': 2,
-    'p_dispose_field': 2
-}
-
-# Manure management practices weights
-manure_columns_weights = {
-    'manure_mngt_composting': 1,
-    'manure_mngt_fields': 2,
-    'manure_mngt_storing': 1,
-    'manure_mngt_landfill': 2
-}
-
-# Storage duration weights
-storage_columns_weights = {
-    'store_lessthan1week': 2,
-    'store_1-2weeks': 1,
-    'store_morethan2weeks': 1,
-    'store_dontstore': 2
-}
+# Compliance (Likert 1-5) and risk weights: scoring.WEIGHT_SETS['model2']
+SCORE_WEIGHTS = 'model2'
 
 def preprocess_input(raw_data, model_feature_columns=None, disease_chicken_list=None, disease_pig_list=None, antibiotics_list=None):
     """
@@ -637,27 +633,12 @@ def preprocess_input(raw_data, model_feature_columns=None, disease_chicken_list=
         col = f"store_{val}"
         features[col] = 1 if store_val == val else 0
 
-    # Diseases and Antibiotics one-hot encoding
-    chicken_disease_ids = raw_json.get('disease_chicken', [])
-    if not isinstance(chicken_disease_ids, list):
-        try:
-            chicken_disease_ids = eval(chicken_disease_ids) if isinstance(chicken_disease_ids, str) else []
-        except:
-            chicken_disease_ids = []
+    # Diseases and Antibiotics one-hot encoding (string cells parsed as literals, never evaluated)
+    chicken_disease_ids = featurize.parse_id_list(raw_json.get('disease_chicken', []))
 
-    pig_disease_ids = raw_json.get('disease_pig', [])
-    if not isinstance(pig_disease_ids, list):
-        try:
-            pig_disease_ids = eval(pig_disease_ids) if isinstance(pig_disease_ids, str) else []
-        except:
-            pig_disease_ids = []
+    pig_disease_ids = featurize.parse_id_list(raw_json.get('disease_pig', []))
 
-    antibiotics_used_ids = raw_json.get('antibiotics_used', [])
-    if not isinstance(antibiotics_used_ids, list):
-        try:
-            antibiotics_used_ids = eval(antibiotics_used_ids) if isinstance(antibiotics_used_ids, str) else []
-        except:
-            antibiotics_used_ids = []
+    antibiotics_used_ids = featurize.parse_id_list(raw_json.get('antibiotics_used', []))
 
     for disease_id in (disease_chicken_list or []):
         col = f'disease_chicken_{disease_id}'
@@ -680,35 +661,10 @@ def preprocess_input(raw_data, model_feature_columns=None, disease_chicken_list=
     features['education'] = education_map.get(str(features.get('education', 'unknown')).lower(), 4)
     features['farm_type'] = farm_type_map.get(str(features.get('farm_type', 'unknown')).lower(), 3)
 
-    # --- Calculate compliance_score ---
-    # These questions should be on a Likert scale (1-5), not binary (0/1)
-    compliance_columns = [
-        'follow_prescription', 'check_expiry', 'increase_dosage', 'improvement_stop',
-        'misuse_amr', 'training_usage', 'consult_veterinan', 'amr_is_problem',
-        'regulations', 'withdraw', 'importance_withdraw'
-    ]
-
-    # Sum and normalize (assuming Likert scale 1-5)
-    compliance_sum = sum([features.get(col, 0) for col in compliance_columns])
-    max_possible_compliance = len(compliance_columns) * 5  # 5 is the maximum score per question
-    compliance_score = (compliance_sum / max_possible_compliance) * 100 if max_possible_compliance > 0 else 0
-    features['compliance_score'] = compliance_score
-
-    # --- Calculate risk_score ---
-    risk_factors = {}
-    risk_factors.update(disposal_columns_weights)
-    risk_factors.update(manure_columns_weights)
-    risk_factors.update(storage_columns_weights)
-
-    # Compute risk_score numerator
-    risk_score_num = 0
-    for col, weight in risk_factors.items():
-        val = features.get(col, 0)
-        risk_score_num += val * weight
-
-    max_possible_risk = sum(risk_factors.values())  # denominator for normalization
-    risk_score = (risk_score_num / max_possible_risk) * 100 if max_possible_risk > 0 else 0
-    features['risk_score'] = risk_score
+    # --- Calculate compliance_score (Likert scale 1-5) and risk_score ---
+    compliance, risk = scoring.get_engine(SCORE_WEIGHTS).score(features, 1)
+    compliance_score = features['compliance_score'] = float(compliance[0])
+    risk_score = features['risk_score'] = float(risk[0])
 
     # For single prediction, we can't calculate percentiles, so we'll use fixed thresholds
     # These should be calibrated based on your training data
@@ -729,6 +685,73 @@ def preprocess_input(raw_data, model_feature_columns=None, disease_chicken_list=
     
     return df
 
+def preprocess_frame(df, model_feature_columns=None, disease_chicken_list=None, disease_pig_list=None, antibiotics_list=None):
+    """
+    Columnar preprocess_input: featurize every row of a survey DataFrame at once
+
+    Parameters: same as preprocess_input, with a DataFrame of raw records
+    Returns: DataFrame with one row per input row, identical to concatenating
+    preprocess_input over the rows
+    """
+    n = len(df)
+    features = {}
+
+    # Scalar fields with default fallback
+    scalar_fields = [
+        'gender', 'age', 'education', 'farm_type', 'years_farming',
+        'follow_prescription', 'check_expiry', 'increase_dosage', 'improvement_stop',
+        'misuse_amr', 'training_usage', 'consult_veterinan', 'amr_is_problem',
+        'regulations', 'withdraw', 'importance_withdraw'
+    ]
+    category_maps = {'gender': (gender_map, 2), 'education': (education_map, 4), 'farm_type': (farm_type_map, 3)}
+
+    for f in scalar_fields:
+        if f in category_maps:
+            mapping, default = category_maps[f]
+            features[f] = featurize.encode_category(featurize.column(df, f, 'Unknown'), mapping, default).to_numpy()
+        else:
+            features[f] = featurize.to_int(featurize.column(df, f, 0)).to_numpy()
+
+    # One-hot encode disposal fields (exact, case-insensitive match)
+    one_hot_fields = [
+        ('e_dispose', ['return', 'incineration', 'waste', 'field'], False),
+        ('p_dispose', ['return', 'incineration', 'waste', 'field'], False),
+        ('manure_mngt', ['composting', 'fields', 'storing', 'landfill'], False),
+        ('store', ['lessthan1week', '1-2weeks', 'morethan2weeks', 'dontstore'], True),
+    ]
+    for field, options, strip_spaces in one_hot_fields:
+        values = featurize.lower_strings(featurize.column(df, field, ''))
+        if strip_spaces:
+            values = values.str.replace(' ', '', regex=False)
+        for val in options:
+            features[f"{field}_{val}"] = (values == val).to_numpy().astype(np.int64)
+
+    # Diseases and Antibiotics one-hot encoding
+    counts = {}
+    for field, prefix, ids, count_column in [
+        ('disease_chicken', 'disease_chicken', disease_chicken_list or [], 'disease_chicken_count'),
+        ('disease_pig', 'disease_pig', disease_pig_list or [], 'disease_pig_count'),
+        ('antibiotics_used', 'used', antibiotics_list or [], 'antibiotic_variety'),
+    ]:
+        matrix, counts[count_column] = featurize.multi_hot(featurize.column(df, field, None), ids)
+        for j, identifier in enumerate(ids):
+            features[f'{prefix}_{identifier}'] = matrix[:, j]
+    features.update(counts)
+
+    # --- Calculate compliance_score (Likert scale 1-5) and risk_score ---
+    compliance_score, risk_score = scoring.get_engine(SCORE_WEIGHTS).score(features, n)
+    features['compliance_score'] = compliance_score
+    features['risk_score'] = risk_score
+
+    # Fixed thresholds, as in preprocess_input
+    features['high_risk'] = (risk_score > 60).astype(np.int64)
+    features['non_compliant'] = (compliance_score < 70).astype(np.int64)
+
+    if model_feature_columns:
+        zeros = np.zeros(n, dtype=np.int64)
+        return pd.DataFrame({col: features.get(col, zeros) for col in model_feature_columns})
+    return pd.DataFrame(features)
+
 def load_data_from_csv(
     filepath='Dataset.csv',
     model_feature_columns=None,
@@ -740,19 +763,13 @@ def load_data_from_csv(
         raise FileNotFoundError(f"{filepath} not found. Please provide a valid dataset file.")
     
     df = pd.read_csv(filepath)
-    processed_rows = []
-    
-    for _, row in df.iterrows():
-        processed_row = preprocess_input(
-            row, 
-            model_feature_columns, 
-            disease_chicken_list, 
-            disease_pig_list, 
-            antibiotics_list
-        )
-        processed_rows.append(processed_row)
-    
-    return pd.concat(processed_rows, ignore_index=True)
+    return preprocess_frame(
+        df,
+        model_feature_columns,
+        disease_chicken_list,
+        disease_pig_list,
+        antibiotics_list
+    )
 
 def train_amu_model(df):
     feature_columns = [
@@ -772,8 +789,8 @@ def train_amu_model(df):
             X[col] = le.fit_transform(X[col].astype(str))
 
     X = X.fillna(0)
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TRAINING_PARAMS['test_size'], random_state=TRAINING_PARAMS['random_state'])
+    model = RandomForestClassifier(n_estimators=TRAINING_PARAMS['n_estimators'], random_state=TRAINING_PARAMS['random_state'])
     model.fit(X_train, y_train)
 
     y_pred = model.predict(X_test)
@@ -812,8 +829,8 @@ def train_biosecurity_model(df):
             X[col] = le.fit_transform(X[col].astype(str))
 
     X = X.fillna(0)
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TRAINING_PARAMS['test_size'], random_state=TRAINING_PARAMS['random_state'])
+    model = RandomForestClassifier(n_estimators=TRAINING_PARAMS['n_estimators'], random_state=TRAINING_PARAMS['random_state'])
     model.fit(X_train, y_train)
 
     y_pred = model.predict(X_test)
@@ -821,6 +838,93 @@ def train_biosecurity_model(df):
 
     return model, feature_columns, accuracy
 
+def train_models(filepath, disease_chicken_list=None, disease_pig_list=None, antibiotics_list=None):
+    """
+    Preprocess the dataset, label it by percentiles and fit both models
+    """
+    df_processed = load_data_from_csv(
+        filepath,
+        None,
+        disease_chicken_list,
+        disease_pig_list,
+        antibiotics_list
+    )
+
+    # Calculate high_risk and non_compliant based on percentiles
+    df_processed['high_risk'] = (df_processed['risk_score'] > df_processed['risk_score'].quantile(TRAINING_PARAMS['high_risk_quantile'])).astype(int)
+    df_processed['non_compliant'] = (df_processed['compliance_score'] < df_processed['compliance_score'].quantile(TRAINING_PARAMS['non_compliant_quantile'])).astype(int)
+
+    amu_model, amu_features, amu_acc = train_amu_model(df_processed)
+    bio_model, bio_features, bio_acc = train_biosecurity_model(df_processed)
+    return {
+        'amu_model': amu_model,
+        'amu_features': amu_features,
+        'amu_accuracy': amu_acc,
+        'bio_model': bio_model,
+        'bio_features': bio_features,
+        'bio_accuracy': bio_acc,
+    }
+
+def artifact_key(filepath, disease_chicken_list=None, disease_pig_list=None, antibiotics_list=None):
+    """
+    sha256 of the dataset bytes plus everything else that shapes the fitted models
+    """
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    params = {
+        'training': TRAINING_PARAMS,
+        'disease_chicken_list': disease_chicken_list,
+        'disease_pig_list': disease_pig_list,
+        'antibiotics_list': antibiotics_list,
+        # compliance_score and risk_score are model features
+        'score_weights': scoring.get_engine(SCORE_WEIGHTS).describe(),
+        # Pickled estimators are only safe to reuse with the sklearn that wrote them
+        'sklearn': sklearn.__version__,
+    }
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+def load_or_train_models(
+    filepath='Dataset.csv',
+    disease_chicken_list=None,
+    disease_pig_list=None,
+    antibiotics_list=None,
+    artifact_dir=None
+):
+    """
+    Trained models for this dataset and TRAINING_PARAMS. The first call trains and
+    pickles them under artifact_dir; later calls with the same key just unpickle.
+    """
+    if not os.path.exists(filepath):
+        raise FileNotFoundError(f"{filepath} not found. Please provide a valid dataset file.")
+
+    artifact_dir = artifact_dir or ARTIFACT_DIR
+    key = artifact_key(filepath, disease_chicken_list, disease_pig_list, antibiotics_list)
+    artifact_path = os.path.join(artifact_dir, f'model2_{key[:16]}.pkl')
+
+    if os.path.exists(artifact_path):
+        try:
+            with open(artifact_path, 'rb') as f:
+                artifacts = pickle.load(f)
+            if artifacts.get('key') == key:
+                return artifacts
+        except Exception:
+            # Unreadable or truncated artifact: fall through and retrain
+            pass
+
+    artifacts = train_models(filepath, disease_chicken_list, disease_pig_list, antibiotics_list)
+    artifacts['key'] = key
+
+    # Write to a temp file and rename, so concurrent runs never read a partial pickle
+    os.makedirs(artifact_dir, exist_ok=True)
+    tmp_path = f'{artifact_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(artifacts, f)
+    os.replace(tmp_path, artifact_path)
+    return artifacts
+
 def predict_from_json(raw_json, amu_model, bio_model, disease_chicken_list=None, disease_pig_list=None, antibiotics_list=None):
     # Prepare input row for both models
     amu_features = amu_model.feature_names_in_ if hasattr(amu_model, 'feature_names_in_') else []
@@ -875,22 +979,14 @@ def main():
     disease_pig_list = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11]
     antibiotics_list = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22]
 
-    # Load and preprocess data
-    df_processed = load_data_from_csv(
-        csv_path, 
-        None, 
-        disease_chicken_list, 
-        disease_pig_list, 
+    # Trained models, reused from the artifact cache unless the data or params changed
+    artifacts = load_or_train_models(
+        csv_path,
+        disease_chicken_list,
+        disease_pig_list,
         antibiotics_list
     )
-    
-    # Calculate high_risk and non_compliant based on percentiles
-    df_processed['high_risk'] = (df_processed['risk_score'] > df_processed['risk_score'].quantile(0.75)).astype(int)
-    df_processed['non_compliant'] = (df_processed['compliance_score'] < df_processed['compliance_score'].quantile(0.25)).astype(int)
-
-    # Train models
-    amu_model, amu_features, amu_acc = train_amu_model(df_processed)
-    bio_model, bio_features, bio_acc = train_biosecurity_model(df_processed)
+    amu_model, bio_model = artifacts['amu_model'], artifacts['bio_model']
 
     # Read input from stdin
     input_json_str = sys.stdin.read()
@@ -12,8 +12,21 @@ from sklearn.metrics import accuracy_score
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 
+import featurize
+import scoring
+from feature_plan import FeaturePlan
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Shared serving helpers (tree_engine, tracing) live one level up in models/
+sys.path.insert(1, os.path.dirname(BASE_DIR))
+
+import tracing
+
 warnings.filterwarnings('ignore')
 
+# Compliance and risk weights: scoring.WEIGHT_SETS['modelB']
+SCORE_WEIGHTS = 'modelB'
+
 disease_chicken_map = {
     1: 'Newcastle',
     2: 'Infectious Bursal',
@@ -64,10 +77,6 @@ antibiotics_map = {
     22: 'Oxytetracycline'
 }
 
-gender_map = {'male': 0, 'female': 1, 'unknown': 2, 'Unknown': 2}
-education_map = {'none': 0, 'primary': 1, 'secondary': 2, 'tertiary': 3, 'Unknown': 4, 'unknown': 4}
-farm_type_map = {'small': 0, 'medium': 1, 'large': 2, 'Unknown': 3, 'unknown': 3}
-
 # Antibiotic disposal practices
 disposal_columns_weights = {
     'e_dispose_return': 1,
@@ -101,17 +110,7 @@ def convert_yes_no_to_binary(value):
     """
     Convert various yes/no formats to binary (0/1)
     """
-    if isinstance(value, (int, float)):
-        return 1 if value == 1 else 0
-    
-    if isinstance(value, str):
-        value_lower = value.lower().strip()
-        if value_lower in ['yes', 'y', 'true', '1', 'agree']:
-            return 1
-        elif value_lower in ['no', 'n', 'false', '0', 'disagree']:
-            return 0
-    
-    return 0  # Default to 0 for any other case
+    return featurize.yes_no_value(value)
 
 def preprocess_input(raw_data, model_feature_columns=None, disease_chicken_list=None, disease_pig_list=None, antibiotics_list=None):
     """
@@ -123,220 +122,123 @@ def preprocess_input(raw_data, model_feature_columns=None, disease_chicken_list=
         raw_json = raw_data
     
     features = {}
-    
-    print(f"DEBUG: Processing raw data with keys: {list(raw_json.keys())}", file=sys.stderr)
 
-    # 1. Process basic demographic fields
-    basic_fields = ['gender', 'age', 'education', 'farm_type', 'years_farming']
-    for field in basic_fields:
-        if field in raw_json:
-            features[field] = raw_json[field]
-        else:
-            features[field] = 'Unknown' if field in ['gender', 'education', 'farm_type'] else 0
-    
-    # Convert numeric fields
-    for field in ['age', 'years_farming']:
-        if field in features:
-            try:
-                features[field] = int(features[field])
-            except:
-                features[field] = 0
-
-    # 2. Process compliance fields (yes/no to 1/0)
-    compliance_fields = [
-        'follow_prescription', 'check_expiry', 'increase_dosage', 'improvement_stop',
-        'misuse_amr', 'training_usage', 'consult_veterinan', 'amr_is_problem',
-        'regulations', 'withdraw', 'importance_withdraw'
-    ]
-    
-    for field in compliance_fields:
-        if field in raw_json:
-            val = raw_json[field]
-            if isinstance(val, (int, float)):
-                features[field] = 1 if val == 1 else 0
-            elif isinstance(val, str):
-                val_lower = val.lower().strip()
-                features[field] = 1 if val_lower in ['yes', 'y', 'true', '1', 'agree'] else 0
-            else:
-                features[field] = 0
-        else:
-            features[field] = 0
-
-    # 3. Process disposal methods
-    disposal_mapping = {
-        'e_dispose': {
-            'return': 'e_dispose_return',
-            'incineration': 'e_dispose_Incineration',
-            'waste': 'e_dispose_as_waste',
-            'field': 'e_dispose_field'
-        },
-        'p_dispose': {
-            'return': 'p_dispose_Reuse',
-            'incineration': 'p_dispose_Incineration',
-            'waste': 'p_dispose_as_waste',
-            'field': 'p_dispose_field'
-        }
-    }
-    
-    for dispose_type, mapping in disposal_mapping.items():
-        if dispose_type in raw_json:
-            value = str(raw_json[dispose_type]).lower()
-            for option, column_name in mapping.items():
-                features[column_name] = 1 if option in value else 0
+    # 1. Basic demographic fields
+    for field in featurize.DEMOGRAPHIC_FIELDS:
+        if field in featurize.INT_FIELDS:
+            features[field] = featurize.to_int_value(raw_json.get(field, 0))
         else:
-            # Set all to 0 if not provided
-            for column_name in mapping.values():
-                features[column_name] = 0
-
-    # 4. Process manure management
-    manure_mapping = {
-        'composting': 'manure_mngt_composting',
-        'fields': 'manure_mngt_fields',
-        'storing': 'manure_mngt_Storing',
-        'landfill': 'manure_mngt_landfill'
-    }
-    
-    if 'manure_mngt' in raw_json:
-        manure_val = str(raw_json['manure_mngt']).lower()
-        for option, column_name in manure_mapping.items():
-            features[column_name] = 1 if option in manure_val else 0
+            features[field] = raw_json.get(field, 'Unknown')
+
+    # 2. Compliance fields (yes/no to 1/0)
+    for field in featurize.COMPLIANCE_FIELDS:
+        features[field] = featurize.yes_no_value(raw_json[field]) if field in raw_json else 0
+
+    # 3-4. Disposal methods and manure management (substring match)
+    for field, mapping in featurize.KEYWORD_FIELDS.items():
+        value = str(raw_json[field]).lower() if field in raw_json else None
+        for option, column_name in mapping:
+            features[column_name] = 1 if value is not None and option in value else 0
+
+    # 5. Storage: first matching keyword wins; no match sets every store column to 0
+    store_column = featurize.match_store(raw_json['store']) if 'store' in raw_json else None
+    if store_column is not None:
+        features[store_column] = 1
     else:
-        for column_name in manure_mapping.values():
+        for column_name in featurize.STORE_COLUMNS:
             features[column_name] = 0
 
-    # 5. Process storage
-    storage_mapping = {
-        'lessthan1week': 'store_lessweek',
-        'lessweek': 'store_lessweek',
-        '1-2weeks': 'store_1-2 weeks',
-        '1-2 weeks': 'store_1-2 weeks',
-        'morethan2weeks': 'store_morethan2',
-        'morethan2': 'store_morethan2',
-        'dontstore': 'store_dont_store',
-        'dont_store': 'store_dont_store'
-    }
-    
-    if 'store' in raw_json:
-        store_val = str(raw_json['store']).lower().replace(' ', '')
-        for option, column_name in storage_mapping.items():
-            if option in store_val:
-                features[column_name] = 1
-                break
-        else:
-            # If no match found, set all to 0
-            for column_name in set(storage_mapping.values()):
-                features[column_name] = 0
-    else:
-        for column_name in set(storage_mapping.values()):
-            features[column_name] = 0
+    # 6. Diseases and antibiotics, one column per known ID
+    id_lists = {field: featurize.parse_id_list(raw_json[field]) if field in raw_json else []
+                for field in featurize.ID_LIST_FIELDS}
+    for field, (prefix, ids, _) in featurize.ID_LIST_FIELDS.items():
+        for i in ids:
+            features[f'{prefix}_{i}'] = 1 if i in id_lists[field] else 0
 
-    # 6. Process diseases and antibiotics
-    # Chicken diseases
-    chicken_diseases = []
-    if 'disease_chicken' in raw_json:
-        chicken_data = raw_json['disease_chicken']
-        if isinstance(chicken_data, list):
-            chicken_diseases = chicken_data
-        elif isinstance(chicken_data, str):
-            try:
-                chicken_diseases = eval(chicken_data)
-            except:
-                chicken_diseases = []
-    
-    # Pig diseases
-    pig_diseases = []
-    if 'disease_pig' in raw_json:
-        pig_data = raw_json['disease_pig']
-        if isinstance(pig_data, list):
-            pig_diseases = pig_data
-        elif isinstance(pig_data, str):
-            try:
-                pig_diseases = eval(pig_data)
-            except:
-                pig_diseases = []
-    
-    # Antibiotics
-    antibiotics = []
-    if 'antibiotics_used' in raw_json:
-        ab_data = raw_json['antibiotics_used']
-        if isinstance(ab_data, list):
-            antibiotics = ab_data
-        elif isinstance(ab_data, str):
-            try:
-                antibiotics = eval(ab_data)
-            except:
-                antibiotics = []
-
-    # Create disease columns
-    for i in range(1, 9):  # Chicken diseases 1-8
-        features[f'disease_chicken_{i}'] = 1 if i in chicken_diseases else 0
-    
-    for i in range(1, 12):  # Pig diseases 1-11
-        features[f'disease_pig_{i}'] = 1 if i in pig_diseases else 0
-    
-    # Create antibiotic columns
-    for i in range(1, 23):  # Antibiotics 1-22
-        features[f'used_{i}'] = 1 if i in antibiotics else 0
-
-    # 7. Create count fields
-    features['chicken_disease_count'] = len(chicken_diseases)
-    features['pig_disease_count'] = len(pig_diseases)
-    features['antibiotic_variety'] = len(antibiotics)
+    # 7. Count fields
+    for field, (_, _, count_column) in featurize.ID_LIST_FIELDS.items():
+        features[count_column] = len(id_lists[field])
 
     # 8. Encode categorical variables
-    gender_map = {'male': 0, 'female': 1, 'unknown': 2, 'Unknown': 2}
-    education_map = {'none': 0, 'primary': 1, 'secondary': 2, 'tertiary': 3, 'Unknown': 4, 'unknown': 4}
-    farm_type_map = {'small': 0, 'medium': 1, 'large': 2, 'Unknown': 3, 'unknown': 3}
-    
-    if 'gender' in features:
-        features['gender'] = gender_map.get(str(features['gender']).lower(), 2)
-    if 'education' in features:
-        features['education'] = education_map.get(str(features['education']).lower(), 4)
-    if 'farm_type' in features:
-        features['farm_type'] = farm_type_map.get(str(features['farm_type']).lower(), 3)
-
-    # 9. Calculate compliance score
-    compliance_score_fields = [
-        'follow_prescription', 'check_expiry', 'increase_dosage', 'improvement_stop',
-        'misuse_amr', 'training_usage', 'consult_veterinan', 'amr_is_problem',
-        'regulations', 'withdraw', 'importance_withdraw'
-    ]
-    
-    compliance_sum = sum(features.get(field, 0) for field in compliance_score_fields)
-    max_compliance = len(compliance_score_fields)
-    features['compliance_score'] = (compliance_sum / max_compliance) * 100 if max_compliance > 0 else 0
-
-    # 10. Calculate risk score
-    risk_columns = [
-        'e_dispose_as_waste', 'e_dispose_field', 'p_dispose_Reuse', 'p_dispose_field',
-        'manure_mngt_fields', 'manure_mngt_landfill', 'store_lessweek', 'store_dont_store'
-    ]
-    
-    risk_weights = {col: 2 for col in risk_columns}
-    risk_score_num = sum(features.get(col, 0) * risk_weights.get(col, 1) for col in risk_columns)
-    max_risk = sum(risk_weights.values())
-    features['risk_score'] = (risk_score_num / max_risk) * 100 if max_risk > 0 else 0
+    for field, mapping, default in featurize.CATEGORY_FIELDS:
+        features[field] = mapping.get(str(features[field]).lower(), default)
 
-    print(f"DEBUG: Processed features keys: {list(features.keys())}", file=sys.stderr)
-    print(f"DEBUG: compliance_score: {features.get('compliance_score', 'MISSING')}", file=sys.stderr)
-    print(f"DEBUG: risk_score: {features.get('risk_score', 'MISSING')}", file=sys.stderr)
+    # 9-10. Compliance and risk scores
+    compliance, risk = scoring.get_engine(SCORE_WEIGHTS).score(features, 1)
+    features['compliance_score'] = float(compliance[0])
+    features['risk_score'] = float(risk[0])
 
     # 11. Ensure all expected model columns are present
     if model_feature_columns:
         for col in model_feature_columns:
             if col not in features:
                 features[col] = 0
-                print(f"DEBUG: Added missing column: {col}", file=sys.stderr)
 
     # 12. Create DataFrame in the correct order
     if model_feature_columns:
         df = pd.DataFrame([features], columns=model_feature_columns)
     else:
         df = pd.DataFrame([features])
-    
-    print(f"DEBUG: Final DataFrame columns: {list(df.columns)}", file=sys.stderr)
     return df
 
+def preprocess_frame(df, model_feature_columns=None):
+    """
+    Columnar preprocess_input: featurize every row of a survey DataFrame at once.
+    Matches preprocess_input row for row; all four store_* columns are always
+    present (0 where preprocess_input would leave them out).
+    """
+    n = len(df)
+    features = {}
+
+    # 1. Basic demographic fields
+    features['gender'] = featurize.column(df, 'gender', 'Unknown')
+    features['age'] = featurize.to_int(featurize.column(df, 'age', 0)).to_numpy()
+    features['education'] = featurize.column(df, 'education', 'Unknown')
+    features['farm_type'] = featurize.column(df, 'farm_type', 'Unknown')
+    features['years_farming'] = featurize.to_int(featurize.column(df, 'years_farming', 0)).to_numpy()
+
+    # 2. Compliance fields (yes/no to 1/0)
+    for field in featurize.COMPLIANCE_FIELDS:
+        features[field] = featurize.yes_no_to_binary(featurize.column(df, field, 0)).to_numpy()
+
+    # 3-4. Disposal methods and manure management (substring match)
+    for field, mapping in featurize.KEYWORD_FIELDS.items():
+        values = featurize.lower_strings(featurize.column(df, field, ''))
+        for option, column_name in mapping:
+            features[column_name] = values.str.contains(option, regex=False).to_numpy().astype(np.int64)
+
+    # 5. Storage: first matching keyword wins
+    store_values = featurize.lower_strings(featurize.column(df, 'store', '')).str.replace(' ', '', regex=False)
+    matched = np.zeros(n, dtype=bool)
+    for column_name in featurize.STORE_COLUMNS:
+        features[column_name] = np.zeros(n, dtype=np.int64)
+    for option, column_name in featurize.STORE_KEYWORDS:
+        hit = store_values.str.contains(option, regex=False).to_numpy() & ~matched
+        features[column_name][hit] = 1
+        matched |= hit
+
+    # 6-7. Diseases, antibiotics and their counts
+    counts = {}
+    for field, (prefix, ids, count_column) in featurize.ID_LIST_FIELDS.items():
+        ids = list(ids)
+        matrix, counts[count_column] = featurize.multi_hot(featurize.column(df, field, None), ids)
+        for j, identifier in enumerate(ids):
+            features[f'{prefix}_{identifier}'] = matrix[:, j]
+    features.update(counts)
+
+    # 8. Encode categorical variables
+    for field, mapping, default in featurize.CATEGORY_FIELDS:
+        features[field] = featurize.encode_category(features[field], mapping, default).to_numpy()
+
+    # 9-10. Compliance and risk scores
+    features['compliance_score'], features['risk_score'] = scoring.get_engine(SCORE_WEIGHTS).score(features, n)
+
+    # 11-12. Model columns in order, missing ones as 0
+    if model_feature_columns:
+        zeros = np.zeros(n, dtype=np.int64)
+        return pd.DataFrame({col: features.get(col, zeros) for col in model_feature_columns})
+    return pd.DataFrame(features)
+
 # def convert_np_int(obj):
 #     """Convert numpy types to native Python types for JSON serialization"""
 #     if isinstance(obj, (np.integer, np.int64)):
@@ -367,24 +269,17 @@ def debug_compliance_calculation(raw_json):
         'regulations', 'withdraw', 'importance_withdraw'
     ]
     
-    compliance_sum = 0
+    answers = {}
     for field in compliance_fields:
         val = raw_json.get(field, 0)
-        field_value = 0
-        
-        if isinstance(val, (int, float)):
-            field_value = 1 if val == 1 else 0
-        elif isinstance(val, str):
-            val_lower = val.lower().strip()
-            field_value = 1 if val_lower in ['yes', 'y', 'true', '1', 'agree'] else 0
-        
-        print(f"{field}: {val} -> {field_value}", file=sys.stderr)
-        compliance_sum += field_value
-    
-    max_compliance = len(compliance_fields)
-    compliance_score = (compliance_sum / max_compliance) * 100 if max_compliance > 0 else 0
-    
-    print(f"Compliance sum: {compliance_sum}/{max_compliance}", file=sys.stderr)
+        answers[field] = convert_yes_no_to_binary(val)
+        print(f"{field}: {val} -> {answers[field]}", file=sys.stderr)
+
+    engine = scoring.get_engine(SCORE_WEIGHTS)
+    compliance, _ = engine.score(answers, 1)
+    compliance_score = float(compliance[0])
+
+    print(f"Compliance sum: {sum(answers.values())}/{engine.compliance_denominator}", file=sys.stderr)
     print(f"Compliance score: {compliance_score}", file=sys.stderr)
     return compliance_score
 
@@ -401,14 +296,8 @@ def debug_risk_calculation(raw_json):
     print(f"e_dispose: {e_dispose}", file=sys.stderr)
     print(f"p_dispose: {p_dispose}", file=sys.stderr)
     
-    risk_columns = [
-        'e_dispose_as_waste', 'e_dispose_field', 'p_dispose_Reuse', 'p_dispose_field',
-        'manure_mngt_fields', 'manure_mngt_landfill', 'store_lessweek', 'store_dont_store'
-    ]
-    
     risk_values = {}
-    risk_weights = {col: 2 for col in risk_columns}
-    
+
     # Check disposal methods
     risk_values['e_dispose_as_waste'] = 1 if 'waste' in e_dispose else 0
     risk_values['e_dispose_field'] = 1 if 'field' in e_dispose else 0
@@ -425,17 +314,14 @@ def debug_risk_calculation(raw_json):
     risk_values['store_lessweek'] = 1 if any(x in store_val for x in ['lessthan1week', 'lessweek']) else 0
     risk_values['store_dont_store'] = 1 if any(x in store_val for x in ['dontstore', 'dont_store']) else 0
     
-    risk_score_num = 0
-    for col in risk_columns:
-        value = risk_values.get(col, 0)
-        weight = risk_weights.get(col, 1)
-        risk_score_num += value * weight
-        print(f"{col}: {value} * {weight} = {value * weight}", file=sys.stderr)
-    
-    max_risk = sum(risk_weights.values())
-    risk_score = (risk_score_num / max_risk) * 100 if max_risk > 0 else 0
-    
-    print(f"Risk score sum: {risk_score_num}/{max_risk}", file=sys.stderr)
+    engine = scoring.get_engine(SCORE_WEIGHTS)
+    for col, value, weight, contribution in engine.contributions(risk_values):
+        print(f"{col}: {value:g} * {weight:g} = {contribution:g}", file=sys.stderr)
+
+    _, risk_sum, max_risk = engine.raw_sums(engine.matrix(risk_values, 1)[0])
+    risk_score = float((risk_sum[0] / max_risk) * 100)
+
+    print(f"Risk score sum: {risk_sum[0]:g}/{max_risk:g}", file=sys.stderr)
     print(f"Risk score: {risk_score}", file=sys.stderr)
     return risk_score
 
@@ -445,24 +331,127 @@ def debug_risk_calculation(raw_json):
 
 
 
-def predict_from_json(json_data, model_path='model.pkl'):
+# Loaded model.pkl contents, kept resident for long-running processes and
+# reloaded when the file changes (pipeline.py retrains and --update replace it):
+# absolute path -> (mtime_ns, contents)
+_model_cache = {}
+# Everything below is derived from one loaded file and keyed by the
+# (absolute path, mtime_ns) of model_key(); a reload drops that path's entries.
+# tree_engine-compiled forests, keyed by (model key, model name)
+_compiled_cache = {}
+# (amu_features, bio_features, union of both), keyed by model key
+_feature_columns_cache = {}
+# (FeaturePlan over the union, amu column indices, bio column indices), keyed by (model key, weight version)
+_feature_plan_cache = {}
+
+def load_model_data(model_path='model.pkl'):
     """
-    Load trained model and make prediction from JSON input
+    Load model.pkl and return the cached contents, reloading them (and
+    dropping everything derived from the old file) when the file changes
     """
+    model_path = os.path.join(BASE_DIR, model_path)
     try:
-        # Load the trained model
-        BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-        model_path = os.path.join(BASE_DIR, 'model.pkl')
-        with open(model_path, 'rb') as f:
-            model_data = pickle.load(f)
+        mtime = os.stat(model_path).st_mtime_ns
+        cached = _model_cache.get(model_path)
+        if cached is None or cached[0] != mtime:
+            with open(model_path, 'rb') as f:
+                cached = (mtime, pickle.load(f))
+            _drop_derived(model_path)
+            _model_cache[model_path] = cached
     except Exception as e:
         raise Exception(f"Error loading model: {e}")
-    
-    # Extract models and feature information
-    amu_model = model_data.get('amu_model')
-    bio_model = model_data.get('bio_model')
-    amu_features = model_data.get('amu_features', [])
-    bio_features = model_data.get('bio_features', [])
+    return cached[1]
+
+def _drop_derived(model_path):
+    for cache in (_compiled_cache, _feature_columns_cache, _feature_plan_cache):
+        for key in [key for key in cache if key[0][0] == model_path]:
+            cache.pop(key, None)
+
+def model_key(model_path='model.pkl'):
+    """
+    (absolute path, mtime_ns) of the model file as currently loaded
+    """
+    model_path = os.path.join(BASE_DIR, model_path)
+    if model_path not in _model_cache:
+        load_model_data(model_path)
+    return model_path, _model_cache[model_path][0]
+
+def get_model(model_data, name, model_path='model.pkl', engine='sklearn'):
+    """
+    Return model_data[name], or its tree_engine-compiled form when engine='numpy'
+    """
+    model = model_data.get(name)
+    if engine == 'sklearn' or model is None:
+        return model
+    if engine != 'numpy':
+        raise ValueError(f"Invalid engine '{engine}': use 'sklearn' or 'numpy'")
+
+    key = (model_key(model_path), name)
+    if key not in _compiled_cache:
+        from tree_engine import compile_tree_model
+        _compiled_cache[key] = compile_tree_model(model)
+    return _compiled_cache[key]
+
+def model_feature_columns(model_data, model_path='model.pkl'):
+    """
+    amu_features, bio_features and their ordered union, computed once per loaded model file
+    """
+    key = (model_key(model_path),)
+    if key not in _feature_columns_cache:
+        amu_features = list(model_data.get('amu_features', []))
+        bio_features = list(model_data.get('bio_features', []))
+        all_features = list(dict.fromkeys(amu_features + bio_features))
+        _feature_columns_cache[key] = (amu_features, bio_features, all_features)
+    return _feature_columns_cache[key]
+
+def feature_plan(model_data, model_path='model.pkl'):
+    """
+    FeaturePlan for the union of both models' columns plus each model's column
+    indices into its row, compiled once per loaded model file and score weight version
+    """
+    engine = scoring.get_engine(SCORE_WEIGHTS)
+    key = (model_key(model_path), engine.version)
+    if key not in _feature_plan_cache:
+        amu_features, bio_features, all_features = model_feature_columns(model_data, model_path)
+        plan = FeaturePlan(all_features, engine)
+        if plan.unpopulated:
+            print(f"WARNING: model columns never set by featurization (always 0): {plan.unpopulated}", file=sys.stderr)
+        amu_index = np.array([plan.index[col] for col in amu_features], dtype=np.intp)
+        bio_index = np.array([plan.index[col] for col in bio_features], dtype=np.intp)
+        _feature_plan_cache[key] = (plan, amu_index, bio_index)
+    return _feature_plan_cache[key]
+
+def run_diagnostics(json_data, disease_chicken_list=None, disease_pig_list=None, antibiotics_list=None):
+    """
+    Recompute and log the compliance/risk scores step by step (stderr only)
+    """
+    raw_json = json_data.to_dict() if hasattr(json_data, 'to_dict') else json_data
+    debug_compliance_calculation(raw_json)
+    debug_risk_calculation(raw_json)
+
+    # Unconstrained features, so the scores show up even if the models don't use them
+    df_with_scores = preprocess_input(
+        json_data,
+        None,
+        disease_chicken_list,
+        disease_pig_list,
+        antibiotics_list
+    )
+    print(f"DEBUG: compliance_score: {df_with_scores['compliance_score'].iloc[0]}", file=sys.stderr)
+    print(f"DEBUG: risk_score: {df_with_scores['risk_score'].iloc[0]}", file=sys.stderr)
+
+def predict_from_json(json_data, model_path='model.pkl', engine='sklearn', diagnostics=False):
+    """
+    Load trained model and make prediction from JSON input
+    engine='numpy' evaluates both forests through tree_engine instead of sklearn
+    diagnostics=True also runs the step-by-step score debugging
+    """
+    with tracing.span('load_model'):
+        model_data = load_model_data(model_path)
+
+        # Extract models and feature information
+        amu_model = get_model(model_data, 'amu_model', model_path, engine)
+        bio_model = get_model(model_data, 'bio_model', model_path, engine)
     
     if amu_model is None or bio_model is None:
         raise Exception("Loaded model data is missing required components")
@@ -471,53 +460,21 @@ def predict_from_json(json_data, model_path='model.pkl'):
     disease_chicken_list = [1, 2, 3, 4, 5, 6, 7, 8]
     disease_pig_list = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11]
     antibiotics_list = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22]
-    
-    # Get all possible features
-    all_features = list(set(list(amu_features) + list(bio_features)))
 
-    # Debug the score calculations
-    if hasattr(json_data, 'to_dict'):
-        raw_json = json_data.to_dict()
-    else:
-        raw_json = json_data
-    
-    compliance_score = debug_compliance_calculation(raw_json)
-    risk_score = debug_risk_calculation(raw_json)
+    if diagnostics:
+        run_diagnostics(json_data, disease_chicken_list, disease_pig_list, antibiotics_list)
 
+    # Featurize once for both models, straight into the plan's row
+    plan, amu_index, bio_index = feature_plan(model_data, model_path)
+    with tracing.span('featurize'):
+        row = plan.fill(json_data)
+        X_amu = row.take(amu_index, axis=1) if len(amu_index) > 0 else row
+        X_bio = row.take(bio_index, axis=1) if len(bio_index) > 0 else row
     
-    # Preprocess input to get scores first
-    df_with_scores = preprocess_input(
-        json_data, 
-        None,  # Don't constrain by model features
-        disease_chicken_list, 
-        disease_pig_list, 
-        antibiotics_list
-    )
-    
-    # Extract scores
-    compliance_score = df_with_scores['compliance_score'].iloc[0]
-    risk_score = df_with_scores['risk_score'].iloc[0]
-    
-    # Now preprocess with model features for prediction
-    df_processed = preprocess_input(
-        json_data, 
-        all_features,  # Constrain by model features
-        disease_chicken_list, 
-        disease_pig_list, 
-        antibiotics_list
-    )
-    
-    # Prepare data for each model
-    df_amu = df_processed[list(amu_features)] if len(amu_features) > 0 else df_processed
-    df_bio = df_processed[list(bio_features)] if len(bio_features) > 0 else df_processed
-    
-    # Make predictions
-    amu_pred = amu_model.predict(df_amu)[0]
-    bio_pred = bio_model.predict(df_bio)[0]
-    
-    # Get prediction probabilities
-    amu_proba = amu_model.predict_proba(df_amu)[0]
-    bio_proba = bio_model.predict_proba(df_bio)[0]
+    with tracing.span('predict_amu'):
+        amu_proba = amu_model.predict_proba(X_amu)[0]
+    with tracing.span('predict_bio'):
+        bio_proba = bio_model.predict_proba(X_bio)[0]
     
     return {
         # 'amu_prediction': int(amu_pred),
@@ -537,9 +494,11 @@ def main():
     """
     Example of how to use the prediction function with correct yes/no fields
     """
-    # Make prediction
-    input_json_str = sys.stdin.read()
-    input_data = json.loads(input_json_str)
+    # HEXA_TRACE=1 emits one JSON line of per-stage timings to stderr
+    with tracing.trace('modelB'):
+        with tracing.span('parse'):
+            input_json_str = sys.stdin.read()
+            input_data = json.loads(input_json_str)
 
     # input_data = {
     #     "gender": "male",
@@ -568,9 +527,13 @@ def main():
     # }
 
 
-    result = predict_from_json(input_data, './model.pkl')
-    # print("result: ", result)
-    print(json.dumps(result, indent=2, default=convert_np_int))
+        # MODELB_DIAGNOSTICS=1 logs the step-by-step score calculations to stderr
+        diagnostics = os.environ.get('MODELB_DIAGNOSTICS', '') == '1'
+        result = predict_from_json(input_data, './model.pkl', diagnostics=diagnostics)
+        # print("result: ", result)
+        with tracing.span('serialize'):
+            output = json.dumps(result, indent=2, default=convert_np_int)
+    print(output)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
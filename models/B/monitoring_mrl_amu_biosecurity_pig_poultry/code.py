@@ -3,14 +3,14 @@ import numpy as np
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
-from sklearn.ensemble import RandomForestClassifier, IsolationForest
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
 import warnings
 import os
+import sys
 
-from thinc.model import Model
+# Shared helpers (aggregates, pipeline) live in models/B
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import aggregates
+import pipeline
 
 warnings.filterwarnings('ignore')
 # Set page configuration
@@ -34,139 +34,9 @@ def load_data():
             return None
 
     try:
-        df = pd.read_csv('Dataset.csv')
+        # Preprocessing lives in pipeline.py, which needs no Streamlit
+        df = pipeline.load_data('Dataset.csv')
         st.success("Dataset loaded successfully!")
-
-        # Data preprocessing
-        # Handle consent and missing values
-        if 'consent' in df.columns:
-            df = df[df['consent'] == 'Yes']
-
-        # Create comprehensive compliance score
-        compliance_columns_mapping = {
-            'follow_prescription': 'follow_prescription',
-            'check_expiry': 'check_expiry',
-            'increase_dosage': 'increase_dosage',
-            'improvement_stop': 'improvement_stop',
-            'misuse_amr': 'misuse_amr',
-            'training_usage': 'training_usage',
-            'consult_veterinan': 'consult_veterinan',
-            'amr_is_problem': 'amr_is_problem',
-            'regulations': 'regulations',
-            'withdraw': 'withdraw',
-            'importance_withdraw': 'importance_withdraw'
-        }
-
-        for col in compliance_columns_mapping.values():
-            if col in df.columns:
-                df[col] = df[col].map({'Yes': 1, 'No': 0, 'I don\'t know': 0, 'I don\'t Know': 0})
-            else:
-                df[col] = 0
-
-        compliance_columns = [col for col in compliance_columns_mapping.values()]
-        df['compliance_score'] = (df[compliance_columns].sum(axis=1) / len(compliance_columns)) * 100
-
-        # Create comprehensive risk score (0-100)
-        risk_factors = {}
-
-        # Antibiotic disposal practices
-        disposal_columns = ['e_dispose_return', 'e_dispose_Incineration', 'e_dispose_as_waste',
-                            'e_dispose_field', 'p_dispose_Reuse', 'p_dispose_Incineration',
-                            'p_dispose_as_waste', 'p_dispose_field']
-
-        for col in disposal_columns:
-            if col in df.columns:
-                # Higher risk for improper disposal methods
-                if col in ['e_dispose_as_waste', 'e_dispose_field', 'p_dispose_Reuse', 'p_dispose_field']:
-                    risk_factors[col] = 2  # Higher risk
-                else:
-                    risk_factors[col] = 1  # Lower risk
-            else:
-                df[col] = 0
-                risk_factors[col] = 1
-
-        # Manure management practices
-        manure_columns = ['manure_mngt_composting', 'manure_mngt_fields', 'manure_mngt_Storing',
-                          'manure_mngt_landfill', 'manure_mngt_Other']
-
-        for col in manure_columns:
-            if col in df.columns:
-                # Higher risk for improper manure management
-                if col in ['manure_mngt_fields', 'manure_mngt_landfill']:
-                    risk_factors[col] = 2
-                else:
-                    risk_factors[col] = 1
-            else:
-                df[col] = 0
-                risk_factors[col] = 1
-
-        # Storage duration risk
-        storage_columns = ['store_lessweek', 'store_1-2 weeks', 'store_morethan2', 'store_dont_store']
-        for col in storage_columns:
-            if col in df.columns:
-                if col in ['store_lessweek', 'store_dont_store']:
-                    risk_factors[col] = 2
-                else:
-                    risk_factors[col] = 1
-            else:
-                df[col] = 0
-                risk_factors[col] = 1
-
-        # Calculate weighted risk score
-        risk_columns = list(risk_factors.keys())
-        max_possible_risk = sum(risk_factors.values())
-
-        # Calculate actual risk for each farm
-        df['risk_score'] = 0
-        for col in risk_columns:
-            df['risk_score'] += df[col] * risk_factors[col]
-
-        # Normalize to 0-100 scale
-        df['risk_score'] = (df['risk_score'] / max_possible_risk) * 100
-
-        # Identify high-risk farms (top 25%)
-        risk_threshold = df['risk_score'].quantile(0.75)
-        df['high_risk'] = df['risk_score'].apply(lambda x: 1 if x >= risk_threshold else 0)
-
-        # Identify low-compliance farms (bottom 25%)
-        compliance_threshold = df['compliance_score'].quantile(0.25)
-        df['non_compliant'] = df['compliance_score'].apply(lambda x: 1 if x <= compliance_threshold else 0)
-
-        # Process vaccination data
-        chicken_disease_columns = [col for col in df.columns if 'disease_chicken' in col]
-        pig_disease_columns = [col for col in df.columns if 'disease_pig' in col]
-
-        if chicken_disease_columns:
-            df['chicken_disease_count'] = df[chicken_disease_columns].sum(axis=1)
-        else:
-            df['chicken_disease_count'] = 0
-
-        if pig_disease_columns:
-            df['pig_disease_count'] = df[pig_disease_columns].sum(axis=1)
-        else:
-            df['pig_disease_count'] = 0
-
-        # Process antibiotic usage data
-        antibiotic_columns = [col for col in df.columns if col.startswith('used_')]
-        if antibiotic_columns:
-            df['antibiotic_variety'] = df[antibiotic_columns].sum(axis=1)
-        else:
-            df['antibiotic_variety'] = 0
-
-        # Handle missing values in key columns
-        required_columns = ['gender', 'age', 'education', 'farm_type', 'years_farming']
-        for col in required_columns:
-            if col not in df.columns:
-                st.error(f"Required column '{col}' not found in dataset.")
-                return None
-
-            if col == 'years_farming':
-                df['years_farming'] = pd.to_numeric(df['years_farming'], errors='coerce')
-                df['years_farming'] = df['years_farming'].fillna(df['years_farming'].median())
-            else:
-                # For categorical columns, fill with mode
-                df[col] = df[col].fillna(df[col].mode()[0] if not df[col].mode().empty else 'Unknown')
-
         return df
 
     except Exception as e:
@@ -176,113 +46,18 @@ def load_data():
 
 @st.cache_resource
 def train_amu_model(df):
-    feature_columns = [
-        'gender', 'age', 'education', 'farm_type', 'years_farming',
-        'chicken_disease_count', 'pig_disease_count', 'antibiotic_variety'
-    ]
-
-    # Filter to only include columns that exist in the dataframe
-    feature_columns = [col for col in feature_columns if col in df.columns]
-
-    X = df[feature_columns].copy()
-    y = df['non_compliant']
-
-    # Encode categorical variables
-    for col in X.columns:
-        if X[col].dtype == 'object':
-            le = LabelEncoder()
-            X[col] = le.fit_transform(X[col].astype(str))
-
-    X = X.fillna(0)
-
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
-
-    y_pred = model.predict(X_test)
-    accuracy = accuracy_score(y_test, y_pred)
-    import pickle
-    model_data = {
-        'model': model,
-        'feature_columns': feature_columns,
-        'accuracy': accuracy
-    }
-    with open("amu_model.pkl", "wb") as f:
-        pickle.dump(model_data, f)
-    return model, feature_columns, accuracy
+    return pipeline.train_amu_model(df)
 
 
 @st.cache_resource
 def train_biosecurity_model(df):
-    feature_columns = [
-        'gender', 'age', 'education', 'farm_type', 'years_farming',
-        'chicken_disease_count', 'pig_disease_count', 'antibiotic_variety'
-    ]
-
-    # Add manure management columns if available
-    manure_columns = ['manure_mngt_composting', 'manure_mngt_fields', 'manure_mngt_Storing',
-                      'manure_mngt_landfill', 'store_lessweek', 'store_1-2 weeks',
-                      'store_morethan2', 'store_dont_store']
-
-    for col in manure_columns:
-        if col in df.columns:
-            feature_columns.append(col)
-
-    # Filter to only include columns that exist in the dataframe
-    feature_columns = [col for col in feature_columns if col in df.columns]
-
-    X = df[feature_columns].copy()
-    y = df['high_risk']
-
-    for col in X.columns:
-        if X[col].dtype == 'object':
-            le = LabelEncoder()
-            X[col] = le.fit_transform(X[col].astype(str))
-
-    X = X.fillna(0)
-
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
-
-    y_pred = model.predict(X_test)
-    accuracy = accuracy_score(y_test, y_pred)
-    import pickle
-    model_data = {
-        'model': model,
-        'feature_columns': feature_columns,
-        'accuracy': accuracy
-    }
-    with open("bio_model.pkl", "wb") as f:
-        pickle.dump(model_data, f)
-
-    return model, feature_columns, accuracy
+    return pipeline.train_biosecurity_model(df)
 
-def detect_anomalies(df):
-    numerical_features = ['compliance_score', 'risk_score', 'years_farming',
-                          'chicken_disease_count', 'pig_disease_count', 'antibiotic_variety']
-
-    # Filter to only include columns that exist in the dataframe
-    numerical_features = [col for col in numerical_features if col in df.columns]
-
-    # Prepare data
-    X = df[numerical_features].copy()
-
-    # Handle missing values
-    X = X.fillna(0)
-
-    # Scale the data
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
 
-    # Detect anomalies using Isolation Forest
-    iso_forest = IsolationForest(contamination=0.1, random_state=42)
-    anomalies = iso_forest.fit_predict(X_scaled)
-
-    df['anomaly'] = anomalies
-    df['anomaly'] = df['anomaly'].apply(lambda x: 1 if x == -1 else 0)
-
-    return df
+def detect_anomalies(df):
+    # Scored against the persisted detector (only new or changed farms are
+    # evaluated); refit it with `python3 anomaly.py refit`
+    return pipeline.detect_anomalies(df, data_path='Dataset.csv')
 
 
 # Main application
@@ -300,6 +75,9 @@ def main():
     if df is None:
         st.stop()
 
+    # Per-farm_type means come from the persisted aggregate store, not a groupby per rerun
+    farm_type_means = aggregates.farm_type_means('Dataset.csv')
+
     # Sidebar
     st.sidebar.header("Dashboard Controls")
     selected_page = st.sidebar.selectbox(
@@ -371,7 +149,7 @@ def main():
 
         # Compliance by farm type
         st.subheader("Compliance by Farm Type")
-        compliance_by_type = df.groupby('farm_type')['compliance_score'].mean().reset_index()
+        compliance_by_type = farm_type_means['compliance_score']
         fig = px.bar(compliance_by_type, x='farm_type', y='compliance_score',
                      title='Average Compliance Score by Farm Type')
         st.plotly_chart(fig, use_container_width=True)
@@ -404,7 +182,7 @@ def main():
 
         # Risk by farm type
         st.subheader("Risk by Farm Type")
-        risk_by_type = df.groupby('farm_type')['risk_score'].mean().reset_index()
+        risk_by_type = farm_type_means['risk_score']
         fig = px.bar(risk_by_type, x='farm_type', y='risk_score',
                      title='Average Risk Score by Farm Type')
         st.plotly_chart(fig, use_container_width=True)
@@ -466,7 +244,7 @@ def main():
                 st.plotly_chart(fig, use_container_width=True)
 
             with col2:
-                chicken_disease_by_type = df.groupby('farm_type')['chicken_disease_count'].mean().reset_index()
+                chicken_disease_by_type = farm_type_means['chicken_disease_count']
                 fig = px.bar(chicken_disease_by_type, x='farm_type', y='chicken_disease_count',
                              title='Average Chicken Diseases by Farm Type')
                 st.plotly_chart(fig, use_container_width=True)
@@ -483,7 +261,7 @@ def main():
                 st.plotly_chart(fig, use_container_width=True)
 
             with col2:
-                pig_disease_by_type = df.groupby('farm_type')['pig_disease_count'].mean().reset_index()
+                pig_disease_by_type = farm_type_means['pig_disease_count']
                 fig = px.bar(pig_disease_by_type, x='farm_type', y='pig_disease_count',
                              title='Average Pig Diseases by Farm Type')
                 st.plotly_chart(fig, use_container_width=True)
@@ -500,7 +278,7 @@ def main():
                 st.plotly_chart(fig, use_container_width=True)
 
             with col2:
-                antibiotic_by_type = df.groupby('farm_type')['antibiotic_variety'].mean().reset_index()
+                antibiotic_by_type = farm_type_means['antibiotic_variety']
                 fig = px.bar(antibiotic_by_type, x='farm_type', y='antibiotic_variety',
                              title='Average Antibiotic Variety by Farm Type')
                 st.plotly_chart(fig, use_container_width=True)
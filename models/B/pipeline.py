@@ -0,0 +1,491 @@
+import argparse
+import json
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import featurize
+import ingest
+import scoring
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Headless version of the modelpklgen.py training run: preprocess the survey,
+# encode one feature matrix shared by both models and fit the AMU and
+# biosecurity forests at the same time.
+#   python3 pipeline.py --data Dataset.csv --output-dir .
+# Newly uploaded survey rows can instead grow the existing forests:
+#   python3 pipeline.py --update new_rows.csv --new-trees 20 [--window 200]
+# It is also the library behind the Streamlit dashboards' load_data,
+# train_amu_model, train_biosecurity_model and detect_anomalies. Importing it
+# only loads numpy and pandas; scikit-learn is imported by the functions that
+# fit or score, so batch jobs and the server never pay for the UI stack.
+
+# Compliance answers and risk-practice weights: scoring.WEIGHT_SETS['survey']
+COMPLIANCE_COLUMNS = scoring.COMPLIANCE_COLUMNS
+
+REQUIRED_COLUMNS = ['gender', 'age', 'education', 'farm_type', 'years_farming']
+
+AMU_FEATURES = [
+    'gender', 'age', 'education', 'farm_type', 'years_farming',
+    'chicken_disease_count', 'pig_disease_count', 'antibiotic_variety',
+    'follow_prescription', 'check_expiry', 'increase_dosage', 'improvement_stop',
+    'misuse_amr', 'training_usage', 'consult_veterinan', 'amr_is_problem',
+    'regulations', 'withdraw', 'importance_withdraw'
+]
+BIO_FEATURES = [
+    'gender', 'age', 'education', 'farm_type', 'years_farming',
+    'chicken_disease_count', 'pig_disease_count', 'antibiotic_variety',
+    'e_dispose_return', 'e_dispose_Incineration', 'e_dispose_as_waste', 'e_dispose_field',
+    'p_dispose_Reuse', 'p_dispose_Incineration', 'p_dispose_as_waste', 'p_dispose_field',
+    'manure_mngt_composting', 'manure_mngt_fields', 'manure_mngt_Storing', 'manure_mngt_landfill',
+    'store_lessweek', 'store_1-2 weeks', 'store_morethan2', 'store_dont_store'
+]
+
+TRAINING_PARAMS = {
+    'n_estimators': 100,
+    'random_state': 42,
+    'test_size': 0.2,
+    'high_risk_quantile': 0.75,
+    'non_compliant_quantile': 0.25,
+}
+
+# Multi-hot survey flags, stored packed: (group, count column, which wide 0/1
+# columns belong to it). preprocess_survey replaces each group's columns with
+# uint64 words '<group>_bits<w>' and records in df.attrs['flag_columns'][group]
+# which survey column bit j stands for.
+FLAG_GROUPS = [
+    ('chicken_disease', 'chicken_disease_count', lambda col: 'disease_chicken' in col),
+    ('pig_disease', 'pig_disease_count', lambda col: 'disease_pig' in col),
+    ('antibiotic', 'antibiotic_variety', lambda col: col.startswith('used_')),
+]
+
+# Every incremental update also lands here as model-v<version>.pkl
+VERSIONS_DIR = 'model_versions'
+
+
+def preprocess_survey(df, label_thresholds=None):
+    """
+    modelpklgen.load_data without Streamlit: scores, labels and counts for the
+    raw survey. Returns (df, label_thresholds). Pass the thresholds stored with
+    a trained model to label new rows the way its training data was labelled.
+    """
+    # Handle consent and missing values
+    if 'consent' in df.columns:
+        df = df[df['consent'] == 'Yes']
+    df = df.copy()
+
+    # Yes/no answers to 1/0
+    for col in COMPLIANCE_COLUMNS:
+        if col in df.columns:
+            df[col] = _map_answers(df[col], {'Yes': 1, 'No': 0, 'I don\'t know': 0, 'I don\'t Know': 0})
+
+    # Compliance and weighted risk score (0-100) in one matrix product; risk
+    # columns missing from the survey count as 0 with weight 1
+    engine = scoring.get_engine('survey')
+    X, absent = engine.matrix(df)
+    df['compliance_score'], df['risk_score'] = engine.score_matrix(X, absent)
+    for col in engine.columns:
+        if col not in df.columns:
+            df[col] = 0
+
+    # High-risk farms (top 25%) and low-compliance farms (bottom 25%)
+    if label_thresholds is None:
+        label_thresholds = {
+            'risk_score': float(df['risk_score'].quantile(TRAINING_PARAMS['high_risk_quantile'])),
+            'compliance_score': float(df['compliance_score'].quantile(TRAINING_PARAMS['non_compliant_quantile'])),
+        }
+    df['high_risk'] = (df['risk_score'] >= label_thresholds['risk_score']).astype(int)
+    df['non_compliant'] = (df['compliance_score'] <= label_thresholds['compliance_score']).astype(int)
+
+    # Disease and antibiotic flags: packed into bitsets, counted with a popcount
+    flag_columns = {}
+    for group, count_column, is_member in FLAG_GROUPS:
+        columns = [col for col in df.columns if is_member(col)]
+        bits = featurize.pack_flags(df[columns].to_numpy(dtype=float))
+        df = df.drop(columns=columns)
+        for w in range(bits.shape[1]):
+            df[f'{group}_bits{w}'] = bits[:, w]
+        df[count_column] = featurize.popcount(bits)
+        flag_columns[group] = columns
+    df.attrs['flag_columns'] = flag_columns
+
+    # Handle missing values in key columns
+    for col in REQUIRED_COLUMNS:
+        if col not in df.columns:
+            raise ValueError(f"Required column '{col}' not found in dataset.")
+        if col == 'years_farming':
+            df['years_farming'] = pd.to_numeric(df['years_farming'], errors='coerce')
+            df['years_farming'] = df['years_farming'].fillna(df['years_farming'].median())
+        else:
+            mode = df[col].mode()
+            fill = mode[0] if not mode.empty else 'Unknown'
+            if isinstance(df[col].dtype, pd.CategoricalDtype) and fill not in df[col].cat.categories:
+                df[col] = df[col].cat.add_categories([fill])
+            df[col] = df[col].fillna(fill)
+
+    return df, label_thresholds
+
+
+def _map_answers(series, mapping):
+    # series.map(mapping); categorical columns (from ingest) map their categories once
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        lookup = np.array([mapping.get(value, np.nan) for value in series.cat.categories] + [np.nan])
+        return pd.Series(lookup[series.cat.codes.to_numpy()], index=series.index)
+    return series.map(mapping)
+
+
+def flag_bits(df, group):
+    """
+    (n_rows, n_words) uint64 bitsets of a FLAG_GROUPS group in a preprocessed survey
+    """
+    return df[[col for col in df.columns if col.startswith(f'{group}_bits')]].to_numpy(dtype=np.uint64)
+
+
+def flag_cohort(df, group, flags, require_all=False):
+    """
+    Rows of a preprocessed survey with any (require_all: every) of the given
+    survey flag columns of a group set, as a boolean Series; e.g.
+    flag_cohort(df, 'antibiotic', ['used_Penicillin', 'used_Tylosin'])
+    """
+    columns = df.attrs['flag_columns'][group]
+    unknown = [flag for flag in flags if flag not in columns]
+    if unknown:
+        raise KeyError(f"No {group} flag columns {unknown} in this survey")
+    mask = featurize.bit_mask([columns.index(flag) for flag in flags], len(columns))
+    test = featurize.has_all if require_all else featurize.has_any
+    return pd.Series(test(flag_bits(df, group), mask), index=df.index)
+
+
+def shared_feature_matrix(df, feature_lists, label_encoders=None):
+    """
+    Encode the union of the feature lists once: text columns label-encoded,
+    missing values as 0. Returns (X, per-list columns present in df, label_encoders).
+
+    label_encoders maps each text column to its classes; pass the ones saved
+    with a model to encode new rows with the same codes (unseen values get new
+    codes appended after the known classes).
+    """
+    from sklearn.preprocessing import LabelEncoder
+
+    present = [[col for col in features if col in df.columns] for features in feature_lists]
+    columns = list(dict.fromkeys(col for features in present for col in features))
+
+    X = df[columns].copy()
+    encoders = dict(label_encoders or {})
+    for col in X.columns:
+        is_text = (pd.api.types.is_object_dtype(X[col]) or pd.api.types.is_string_dtype(X[col])
+                   or isinstance(X[col].dtype, pd.CategoricalDtype))
+        if not (is_text or col in encoders):
+            continue
+        values = X[col].astype(str)
+        if col in encoders:
+            classes = list(encoders[col])
+            known = set(classes)
+            classes += [value for value in pd.unique(values) if value not in known]
+            X[col] = values.map({value: code for code, value in enumerate(classes)}).astype(np.int64)
+        else:
+            encoder = LabelEncoder()
+            X[col] = encoder.fit_transform(values)
+            classes = encoder.classes_.tolist()
+        encoders[col] = classes
+    return X.fillna(0), present, encoders
+
+
+def fit_forest(X, y, train_index, test_index, n_jobs=-1):
+    """
+    Fit one forest on the shared split; returns (model, accuracy, fit_seconds)
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score
+
+    start = time.perf_counter()
+    model = RandomForestClassifier(
+        n_estimators=TRAINING_PARAMS['n_estimators'],
+        random_state=TRAINING_PARAMS['random_state'],
+        n_jobs=n_jobs
+    )
+    model.fit(X.iloc[train_index], y.iloc[train_index])
+    fit_seconds = time.perf_counter() - start
+    accuracy = accuracy_score(y.iloc[test_index], model.predict(X.iloc[test_index]))
+    return model, accuracy, fit_seconds
+
+
+def split_indices(n_rows):
+    """
+    The dashboards' 80/20 train_test_split, as (train_index, test_index)
+    """
+    from sklearn.model_selection import train_test_split
+
+    return train_test_split(
+        np.arange(n_rows),
+        test_size=TRAINING_PARAMS['test_size'],
+        random_state=TRAINING_PARAMS['random_state']
+    )
+
+
+def train_models(df, n_jobs=-1):
+    """
+    Fit the AMU and biosecurity forests concurrently on one shared matrix.
+    Same models as training them one after the other: the train/test split
+    only depends on the row count and random_state, so both share it.
+    """
+    timings = {}
+    start = time.perf_counter()
+    X, (amu_features, bio_features), label_encoders = shared_feature_matrix(df, [AMU_FEATURES, BIO_FEATURES])
+    train_index, test_index = split_indices(len(X))
+    timings['encode_seconds'] = time.perf_counter() - start
+
+    # Tree building releases the GIL, so two threads plus n_jobs=-1 keep every core busy
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        amu = pool.submit(fit_forest, X[amu_features], df['non_compliant'], train_index, test_index, n_jobs)
+        bio = pool.submit(fit_forest, X[bio_features], df['high_risk'], train_index, test_index, n_jobs)
+        amu_model, amu_accuracy, timings['amu_fit_seconds'] = amu.result()
+        bio_model, bio_accuracy, timings['bio_fit_seconds'] = bio.result()
+    timings['fit_wall_seconds'] = time.perf_counter() - start
+
+    return {
+        'amu_model': amu_model,
+        'amu_features': amu_features,
+        'amu_accuracy': amu_accuracy,
+        'bio_model': bio_model,
+        'bio_features': bio_features,
+        'bio_accuracy': bio_accuracy,
+        'label_encoders': label_encoders,
+    }, timings
+
+
+def save_models(results, label_thresholds, output_dir, version=1):
+    """
+    Write model.pkl (what modelB serves) plus the per-model amu_model.pkl and
+    bio_model.pkl, and keep a copy as model_versions/model-v<version>.pkl
+    """
+    os.makedirs(os.path.join(output_dir, VERSIONS_DIR), exist_ok=True)
+    model_data = {
+        'amu_model': results['amu_model'],
+        'amu_features': results['amu_features'],
+        'bio_model': results['bio_model'],
+        'bio_features': results['bio_features'],
+        'label_thresholds': label_thresholds,
+        'label_encoders': results['label_encoders'],
+        'version': version,
+    }
+    artifacts = {
+        'model.pkl': model_data,
+        'amu_model.pkl': {'model': results['amu_model'], 'feature_columns': results['amu_features'],
+                          'accuracy': results['amu_accuracy']},
+        'bio_model.pkl': {'model': results['bio_model'], 'feature_columns': results['bio_features'],
+                          'accuracy': results['bio_accuracy']},
+    }
+    artifacts[os.path.join(VERSIONS_DIR, f'model-v{version:04d}.pkl')] = model_data
+
+    paths = []
+    for name, data in artifacts.items():
+        path = os.path.join(output_dir, name)
+        _write_pickle(data, path)
+        paths.append(path)
+    return paths
+
+
+def next_version(output_dir):
+    """
+    Version for the next model written to output_dir: one past the current
+    model.pkl's and the highest model_versions/model-v<version>.pkl
+    """
+    versions = [0]
+    try:
+        with open(os.path.join(output_dir, 'model.pkl'), 'rb') as f:
+            versions.append(pickle.load(f).get('version', 0))
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+    versions_dir = os.path.join(output_dir, VERSIONS_DIR)
+    if os.path.isdir(versions_dir):
+        for name in os.listdir(versions_dir):
+            stem, ext = os.path.splitext(name)
+            if ext == '.pkl' and stem.startswith('model-v') and stem[len('model-v'):].isdigit():
+                versions.append(int(stem[len('model-v'):]))
+    return max(versions) + 1
+
+
+def _write_pickle(data, path):
+    # Temp file + rename, so a server reloading model.pkl never sees a partial file
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def grow_forest(model, X, y, new_trees, window=None, n_jobs=-1):
+    """
+    Add `new_trees` trees fitted on (X, y) to a fitted forest via warm_start;
+    with `window`, then drop the oldest trees so at most `window` remain.
+    """
+    missing = set(model.classes_) - set(np.unique(y))
+    if missing:
+        raise ValueError(f"New rows must include every class the model predicts; missing {sorted(missing)}")
+
+    n_before = len(model.estimators_)
+    # A fresh seed per update, so new trees never repeat the bootstrap draws of retired ones
+    model.set_params(warm_start=True, n_estimators=n_before + new_trees, n_jobs=n_jobs,
+                     random_state=TRAINING_PARAMS['random_state'] + n_before + new_trees)
+    model.fit(X, y)
+    model.set_params(warm_start=False)
+
+    if window is not None and len(model.estimators_) > window:
+        model.estimators_ = model.estimators_[-window:]
+        model.n_estimators = len(model.estimators_)
+    return model
+
+
+def update_models(new_data_path, model_path, output_dir, new_trees=10, window=None, n_jobs=-1):
+    """
+    Grow both forests in model.pkl with trees trained only on the new survey
+    rows, labelled and encoded with the thresholds and encoders saved at
+    training time, and write the result as the next model version
+    """
+    from sklearn.metrics import accuracy_score
+
+    wall_start = time.perf_counter()
+    timings = {}
+
+    with open(model_path, 'rb') as f:
+        model_data = pickle.load(f)
+    if 'label_thresholds' not in model_data or 'label_encoders' not in model_data:
+        raise ValueError(f"{model_path} has no label thresholds/encoders; run a full pipeline.py training first")
+
+    start = time.perf_counter()
+    df, label_thresholds = preprocess_survey(ingest.read_survey(new_data_path), model_data['label_thresholds'])
+    amu_features, bio_features = list(model_data['amu_features']), list(model_data['bio_features'])
+    X, _, label_encoders = shared_feature_matrix(df, [amu_features, bio_features], model_data['label_encoders'])
+    timings['preprocess_seconds'] = time.perf_counter() - start
+
+    results = {'amu_features': amu_features, 'bio_features': bio_features, 'label_encoders': label_encoders}
+    for name, features, label in [('amu', amu_features, 'non_compliant'), ('bio', bio_features, 'high_risk')]:
+        model = model_data[f'{name}_model']
+        # How well the current model does on the rows it has not seen yet
+        results[f'{name}_accuracy'] = accuracy_score(df[label], model.predict(X[features]))
+        start = time.perf_counter()
+        results[f'{name}_model'] = grow_forest(model, X[features], df[label], new_trees, window, n_jobs)
+        timings[f'{name}_grow_seconds'] = time.perf_counter() - start
+
+    version = max(model_data.get('version', 0) + 1, next_version(output_dir))
+    start = time.perf_counter()
+    paths = save_models(results, label_thresholds, output_dir, version)
+    timings['save_seconds'] = time.perf_counter() - start
+    timings['wall_seconds'] = time.perf_counter() - wall_start
+
+    return {
+        'rows': len(df),
+        'version': version,
+        'amu_trees': len(results['amu_model'].estimators_),
+        'bio_trees': len(results['bio_model'].estimators_),
+        'amu_accuracy_before_update': results['amu_accuracy'],
+        'bio_accuracy_before_update': results['bio_accuracy'],
+        'timings': timings,
+        'artifacts': paths,
+    }
+
+
+def load_data(data_path='Dataset.csv'):
+    """
+    The dashboards' load_data without Streamlit: the typed survey, preprocessed.
+    Raises ValueError when a required column is missing.
+    """
+    df, _ = preprocess_survey(ingest.load_survey(data_path))
+    return df
+
+
+def _train_one(df, features, label, model_path, n_jobs):
+    X, (present,), _ = shared_feature_matrix(df, [features])
+    train_index, test_index = split_indices(len(X))
+    model, accuracy, _ = fit_forest(X[present], df[label], train_index, test_index, n_jobs)
+    if model_path:
+        _write_pickle({'model': model, 'feature_columns': present, 'accuracy': accuracy}, model_path)
+    return model, present, accuracy
+
+
+def train_amu_model(df, model_path='amu_model.pkl', n_jobs=-1):
+    """
+    AMU compliance forest on the preprocessed survey, saved to model_path
+    (skipped when None). Returns (model, feature_columns, accuracy).
+    """
+    return _train_one(df, AMU_FEATURES, 'non_compliant', model_path, n_jobs)
+
+
+def train_biosecurity_model(df, model_path='bio_model.pkl', n_jobs=-1):
+    """
+    Biosecurity risk forest on the preprocessed survey, saved to model_path
+    (skipped when None). Returns (model, feature_columns, accuracy).
+    """
+    return _train_one(df, BIO_FEATURES, 'high_risk', model_path, n_jobs)
+
+
+def detect_anomalies(df, data_path=None):
+    """
+    Adds the 'anomaly' column (1 = anomalous farm) from the persisted detector
+    """
+    import anomaly
+
+    df['anomaly'] = anomaly.flag_anomalies(df, data_path=data_path)
+    return df
+
+
+def run(data_path, output_dir, n_jobs=-1):
+    """
+    Full training run; returns a report with accuracies, thresholds and timings
+    """
+    wall_start = time.perf_counter()
+    timings = {}
+
+    start = time.perf_counter()
+    df, label_thresholds = preprocess_survey(ingest.load_survey(data_path))
+    timings['preprocess_seconds'] = time.perf_counter() - start
+
+    results, train_timings = train_models(df, n_jobs)
+    timings.update(train_timings)
+
+    version = next_version(output_dir)
+    start = time.perf_counter()
+    paths = save_models(results, label_thresholds, output_dir, version)
+    timings['save_seconds'] = time.perf_counter() - start
+    timings['wall_seconds'] = time.perf_counter() - wall_start
+
+    return {
+        'rows': len(df),
+        'version': version,
+        'amu_accuracy': results['amu_accuracy'],
+        'bio_accuracy': results['bio_accuracy'],
+        'label_thresholds': label_thresholds,
+        'timings': timings,
+        'artifacts': paths,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the AMU and biosecurity models and write model.pkl")
+    parser.add_argument("--data", default=os.path.join(BASE_DIR, 'Dataset.csv'), help="survey CSV")
+    parser.add_argument("--output-dir", default=BASE_DIR, help="where model.pkl, amu_model.pkl and bio_model.pkl go")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="cores per forest (default: all)")
+    parser.add_argument("--update", metavar="NEW_ROWS_CSV",
+                        help="grow the current models with trees fitted on these new survey rows instead of retraining")
+    parser.add_argument("--model", help="model.pkl to update (default: <output-dir>/model.pkl)")
+    parser.add_argument("--new-trees", type=int, default=10, help="trees added per model by --update")
+    parser.add_argument("--window", type=int, help="with --update, keep only the newest WINDOW trees per model")
+    args = parser.parse_args()
+
+    if args.update:
+        model_path = args.model or os.path.join(args.output_dir, 'model.pkl')
+        report = update_models(args.update, model_path, args.output_dir, args.new_trees, args.window, args.n_jobs)
+    else:
+        report = run(args.data, args.output_dir, args.n_jobs)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
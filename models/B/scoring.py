@@ -0,0 +1,211 @@
+import threading
+
+import numpy as np
+
+# Compliance and risk scores as one matrix product. A weight set lists the
+# compliance answer columns and the weighted risk-practice columns; the engine
+# stacks them into a (columns x 2) weight matrix, so scoring any number of
+# farms is X @ W followed by the normalisation of each score:
+#   compliance = sum(answers) / (len(answers) * compliance_max) * 100
+#   risk       = sum(flag * weight) / sum(weights) * 100
+# (split into one product per score when some answers are missing).
+#
+# Weight sets are versioned: WEIGHT_SETS[name][version]. Add a new version
+# rather than editing one in place, so stored scores stay reproducible.
+
+COMPLIANCE_COLUMNS = [
+    'follow_prescription', 'check_expiry', 'increase_dosage', 'improvement_stop',
+    'misuse_amr', 'training_usage', 'consult_veterinan', 'amr_is_problem',
+    'regulations', 'withdraw', 'importance_withdraw'
+]
+
+WEIGHT_SETS = {
+    # The dashboards' load_data / pipeline.preprocess_survey, over the survey's wide columns.
+    # A risk column missing from the survey file counts as 0 with weight 1.
+    'survey': {
+        1: {
+            'compliance_columns': COMPLIANCE_COLUMNS,
+            'compliance_max': 1,
+            'risk_weights': {
+                'e_dispose_return': 1, 'e_dispose_Incineration': 1, 'e_dispose_as_waste': 2,
+                'e_dispose_field': 2, 'p_dispose_Reuse': 2, 'p_dispose_Incineration': 1,
+                'p_dispose_as_waste': 1, 'p_dispose_field': 2,
+                'manure_mngt_composting': 1, 'manure_mngt_fields': 2, 'manure_mngt_Storing': 1,
+                'manure_mngt_landfill': 2, 'manure_mngt_Other': 1,
+                'store_lessweek': 2, 'store_1-2 weeks': 1, 'store_morethan2': 1, 'store_dont_store': 2,
+            },
+            'absent_risk_weight': 1,
+        },
+    },
+    # model2.py: Likert (1-5) compliance answers and its own one-hot column names
+    'model2': {
+        1: {
+            'compliance_columns': COMPLIANCE_COLUMNS,
+            'compliance_max': 5,
+            'risk_weights': {
+                'e_dispose_return': 1, 'e_dispose_incineration': 1, 'e_dispose_waste': 2, 'e_dispose_field': 2,
+                'p_dispose_return': 1, 'p_dispose_incineration': 1, 'p_dispose_waste': 2, 'p_dispose_field': 2,
+                'manure_mngt_composting': 1, 'manure_mngt_fields': 2, 'manure_mngt_storing': 1,
+                'manure_mngt_landfill': 2,
+                'store_lessthan1week': 2, 'store_1-2weeks': 1, 'store_morethan2weeks': 1, 'store_dontstore': 2,
+            },
+            'absent_risk_weight': None,
+        },
+    },
+    # modelB.py: yes/no compliance answers, only the high-risk practices, all weighted 2
+    'modelB': {
+        1: {
+            'compliance_columns': COMPLIANCE_COLUMNS,
+            'compliance_max': 1,
+            'risk_weights': {
+                'e_dispose_as_waste': 2, 'e_dispose_field': 2, 'p_dispose_Reuse': 2, 'p_dispose_field': 2,
+                'manure_mngt_fields': 2, 'manure_mngt_landfill': 2, 'store_lessweek': 2, 'store_dont_store': 2,
+            },
+            'absent_risk_weight': None,
+        },
+    },
+}
+
+# (name, version) -> ScoreEngine
+_engines = {}
+_lock = threading.Lock()
+
+
+class ScoreEngine:
+    """
+    Both scores for a weight set. Columns are the compliance columns followed
+    by the risk columns; missing compliance answers (NaN) count as 0, missing
+    risk flags (NaN) make the risk score NaN, as in the survey preprocessing.
+    """
+
+    def __init__(self, name, version, compliance_columns, risk_weights, compliance_max=1, absent_risk_weight=None):
+        self.name = name
+        self.version = version
+        self.compliance_columns = list(compliance_columns)
+        self.risk_columns = list(risk_weights)
+        self.columns = self.compliance_columns + self.risk_columns
+        self.index = {col: j for j, col in enumerate(self.columns)}
+        self.absent_risk_weight = absent_risk_weight
+
+        n_compliance = len(self.compliance_columns)
+        # Integer weights, so the sums are exact; normalisation happens afterwards
+        self.weights = np.zeros((len(self.columns), 2), dtype=np.float64)
+        self.weights[:n_compliance, 0] = 1
+        self.weights[n_compliance:, 1] = list(risk_weights.values())
+        self.compliance_denominator = n_compliance * compliance_max
+
+    def matrix(self, data, n_rows=None):
+        """
+        (n_rows, len(columns)) float64 matrix from a DataFrame, a dict of
+        columns (arrays or scalars) or a single record; absent columns are 0.
+        Returns (X, names of the risk columns data did not have).
+        """
+        if hasattr(data, 'reindex'):
+            X = data.reindex(columns=self.columns).to_numpy(dtype=np.float64, copy=True)
+            present = np.isin(self.columns, data.columns)
+            X[:, ~present] = 0
+        else:
+            if n_rows is None:
+                n_rows = max((np.size(value) for value in data.values() if np.ndim(value)), default=1)
+            X = np.zeros((n_rows, len(self.columns)), dtype=np.float64)
+            present = np.zeros(len(self.columns), dtype=bool)
+            for j, col in enumerate(self.columns):
+                if col in data:
+                    X[:, j] = data[col]
+                    present[j] = True
+        absent = [col for col in self.risk_columns if not present[self.index[col]]]
+        return X, absent
+
+    def raw_sums(self, X, absent=()):
+        """
+        (compliance sums, risk sums, risk denominator) for the rows of X
+        """
+        weights = self.weights
+        if absent and self.absent_risk_weight is not None:
+            weights = weights.copy()
+            weights[[self.index[col] for col in absent], 1] = self.absent_risk_weight
+
+        if not np.isnan(X).any():
+            sums = X @ weights
+            return sums[:, 0], sums[:, 1], weights[:, 1].sum()
+
+        # NaN * 0 is NaN, so with missing answers each score gets its own block
+        n_compliance = len(self.compliance_columns)
+        compliance_sum = np.nan_to_num(X[:, :n_compliance], nan=0.0) @ weights[:n_compliance, 0]
+        risk_sum = X[:, n_compliance:] @ weights[n_compliance:, 1]
+        return compliance_sum, risk_sum, weights[:, 1].sum()
+
+    def score_matrix(self, X, absent=()):
+        """
+        (compliance_score, risk_score) arrays, both 0-100
+        """
+        compliance_sum, risk_sum, risk_denominator = self.raw_sums(X, absent)
+        compliance = (compliance_sum / self.compliance_denominator) * 100
+        risk = (risk_sum / risk_denominator) * 100
+        return compliance, risk
+
+    def score(self, data, n_rows=None):
+        """
+        score_matrix over a DataFrame, dict of columns or single record
+        """
+        X, absent = self.matrix(data, n_rows)
+        return self.score_matrix(X, absent)
+
+    def contributions(self, record):
+        """
+        [(column, value, weight, value * weight)] of one record's risk score
+        """
+        X, absent = self.matrix(record, 1)
+        weights = self.weights[:, 1]
+        if absent and self.absent_risk_weight is not None:
+            weights = weights.copy()
+            weights[[self.index[col] for col in absent]] = self.absent_risk_weight
+        start = len(self.compliance_columns)
+        return [(col, X[0, start + j], weights[start + j], X[0, start + j] * weights[start + j])
+                for j, col in enumerate(self.risk_columns)]
+
+    def describe(self):
+        return {
+            'name': self.name,
+            'version': self.version,
+            'compliance_columns': self.compliance_columns,
+            'compliance_denominator': self.compliance_denominator,
+            'risk_weights': dict(zip(self.risk_columns, self.weights[len(self.compliance_columns):, 1].tolist())),
+        }
+
+
+def latest_version(name):
+    return max(WEIGHT_SETS[name])
+
+
+def get_engine(name, version=None):
+    """
+    The ScoreEngine for WEIGHT_SETS[name][version] (latest version by default), built once
+    """
+    if version is None:
+        version = latest_version(name)
+    key = (name, version)
+    engine = _engines.get(key)
+    if engine is None:
+        with _lock:
+            engine = _engines.get(key)
+            if engine is None:
+                engine = _engines[key] = ScoreEngine(name, version, **WEIGHT_SETS[name][version])
+    return engine
+
+
+def register_weight_set(name, risk_weights, compliance_columns=COMPLIANCE_COLUMNS, compliance_max=1,
+                        absent_risk_weight=None):
+    """
+    Add the next version of a weight set; returns its version number
+    """
+    with _lock:
+        versions = WEIGHT_SETS.setdefault(name, {})
+        version = max(versions, default=0) + 1
+        versions[version] = {
+            'compliance_columns': list(compliance_columns),
+            'compliance_max': compliance_max,
+            'risk_weights': dict(risk_weights),
+            'absent_risk_weight': absent_risk_weight,
+        }
+    return version
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modelB scripts import each other as top-level modules (and serve.py lives one level up)
+B_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [B_DIR, os.path.dirname(B_DIR)]
@@ -0,0 +1,49 @@
+import os
+
+import pandas as pd
+import pytest
+
+import aggregates
+import ingest
+
+B_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def survey_lines():
+    with open(os.path.join(B_DIR, 'Dataset.csv'), 'rb') as f:
+        return f.read().splitlines(keepends=True)
+
+
+def assert_means_equal(a, b):
+    for metric in aggregates.AGGREGATE_METRICS:
+        pd.testing.assert_frame_equal(a[metric], b[metric], check_exact=False, rtol=1e-12)
+
+
+def test_appended_rows_fold_in_like_a_full_rebuild(tmp_path, survey_lines):
+    data_path = tmp_path / 'survey.csv'
+    data_path.write_bytes(b''.join(survey_lines[:60]))
+    assert aggregates.refresh(str(data_path))['refresh'] == 'full'
+
+    with open(data_path, 'ab') as f:
+        f.write(b''.join(survey_lines[60:]))
+    store = aggregates.refresh(str(data_path))
+    assert store['refresh'] == 'incremental'
+
+    full = aggregates.group_stats(ingest.read_survey(str(data_path)))
+    assert_means_equal(aggregates.means_from_stats(store['stats']), aggregates.means_from_stats(full))
+    tail = aggregates._read_appended(str(data_path), len(b''.join(survey_lines[:60])))
+    assert len(tail) == len(survey_lines) - 60
+    assert tail.dtypes.equals(ingest.read_survey(str(data_path)).dtypes)
+
+
+def test_append_after_unterminated_row_rebuilds(tmp_path, survey_lines):
+    data_path = tmp_path / 'survey.csv'
+    data_path.write_bytes(b''.join(survey_lines[:60]).rstrip(b'\r\n'))
+    aggregates.refresh(str(data_path))
+
+    with open(data_path, 'ab') as f:
+        f.write(b'\n' + b''.join(survey_lines[60:]))
+    store = aggregates.refresh(str(data_path))
+    assert store['refresh'] == 'full'
+    assert store['stats']['rows'] == aggregates.group_stats(ingest.read_survey(str(data_path)))['rows']
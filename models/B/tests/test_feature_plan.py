@@ -0,0 +1,84 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+import modelB
+import scoring
+
+RECORD = {
+    'gender': 'male', 'age': 40, 'years_farming': 10, 'follow_prescription': 'yes',
+    'e_dispose': 'as waste', 'p_dispose': 'return', 'manure_mngt': 'composting', 'store': '1-2 weeks',
+}
+
+
+@pytest.fixture
+def weight_sets(monkeypatch):
+    """
+    A private copy of the modelB weight sets and engines, so registered versions do not leak between tests
+    """
+    monkeypatch.setitem(scoring.WEIGHT_SETS, 'modelB', dict(scoring.WEIGHT_SETS['modelB']))
+    monkeypatch.setattr(scoring, '_engines', {})
+    monkeypatch.setattr(modelB, '_feature_plan_cache', {})
+
+
+@pytest.fixture
+def score_model_path(tmp_path):
+    """
+    A model.pkl whose two models read only compliance_score and risk_score
+    """
+    X = np.column_stack([np.linspace(0, 100, 50), np.linspace(0, 100, 50)])
+    y = (X[:, 0] > 50).astype(int)
+    model = LogisticRegression().fit(X, y)
+    features = ['compliance_score', 'risk_score']
+    path = tmp_path / 'model.pkl'
+    with open(path, 'wb') as f:
+        pickle.dump({'amu_model': model, 'amu_features': features, 'bio_model': model, 'bio_features': features}, f)
+    return str(path)
+
+
+def test_plan_scores_match_preprocess_input(weight_sets):
+    scoring.register_weight_set('modelB', {'e_dispose_as_waste': 3, 'store_1-2 weeks': 1, 'manure_mngt_fields': 4},
+                                compliance_columns=scoring.COMPLIANCE_COLUMNS[:5])
+    model_data = modelB.load_model_data('model.pkl')
+    plan, _, _ = modelB.feature_plan(model_data, 'model.pkl')
+    assert plan.score_version == scoring.latest_version('modelB')
+
+    expected = modelB.preprocess_input(RECORD)
+    full_plan = modelB.FeaturePlan(list(expected.columns), scoring.get_engine('modelB'))
+    row = full_plan.fill(RECORD)[0]
+    for column in ['compliance_score', 'risk_score']:
+        assert row[full_plan.index[column]] == pytest.approx(expected[column].iloc[0])
+
+
+def test_new_weight_version_changes_prediction(weight_sets, score_model_path):
+    before = modelB.predict_from_json(RECORD, model_path=score_model_path)
+    assert before == modelB.predict_from_json(RECORD, model_path=score_model_path)
+
+    # Only the disposal this farm uses counts towards risk now: 12.5 -> 100
+    scoring.register_weight_set('modelB', {'e_dispose_as_waste': 1})
+    after = modelB.predict_from_json(RECORD, model_path=score_model_path)
+    assert after['risk'] != before['risk']
+    assert after['compliance'] != before['compliance']
+
+
+def test_replaced_model_file_is_reloaded(score_model_path):
+    before = modelB.predict_from_json(RECORD, model_path=score_model_path)
+    old_key = modelB.model_key(score_model_path)
+
+    # What pipeline.py does on a retrain: a new model.pkl renamed over the old one
+    X = np.linspace(0, 100, 50).reshape(-1, 1)
+    model = LogisticRegression().fit(X, (X[:, 0] < 20).astype(int))
+    with open(score_model_path + '.tmp', 'wb') as f:
+        pickle.dump({'amu_model': model, 'amu_features': ['compliance_score'],
+                     'bio_model': model, 'bio_features': ['risk_score']}, f)
+    os.replace(score_model_path + '.tmp', score_model_path)
+    mtime = old_key[1] + 1
+    os.utime(score_model_path, ns=(mtime, mtime))
+
+    after = modelB.predict_from_json(RECORD, model_path=score_model_path)
+    assert after != before
+    assert modelB.model_key(score_model_path) == (score_model_path, mtime)
+    assert not [key for key in modelB._feature_plan_cache if key[0] == old_key]
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import featurize
+import pipeline
+
+
+@pytest.mark.parametrize('n_ids', [8, 64, 130])
+def test_bitset_filters_match_multi_hot(n_ids):
+    rng = np.random.default_rng(n_ids)
+    ids = list(range(1, n_ids + 1))
+    lists = pd.Series([rng.choice(ids, size=rng.integers(0, 6), replace=False).tolist() for _ in range(300)])
+    matrix, counts = featurize.multi_hot(lists, ids)
+    bits = featurize.pack_flags(matrix)
+
+    assert (featurize.popcount(bits) == counts).all()
+    for _ in range(20):
+        positions = rng.choice(n_ids, size=rng.integers(1, 4), replace=False)
+        mask = featurize.bit_mask(positions, n_ids)
+        assert (featurize.has_any(bits, mask) == matrix[:, positions].any(axis=1)).all()
+        assert (featurize.has_all(bits, mask) == matrix[:, positions].all(axis=1)).all()
+
+
+def test_survey_flags_are_packed():
+    raw = pd.DataFrame({
+        'gender': ['Male', 'Female', 'Male'], 'age': ['18-35', '36-49', '>50'],
+        'education': ['None', 'Primary school', 'Tertiary education'],
+        'farm_type': ['Pig Farm', 'Poultry farm', 'Both'], 'years_farming': [1, 2, 3],
+        'used_Penicillin': [1, 0, 1], 'used_Tylosin': [0, np.nan, 1], 'used_Colistin': [0, 1, 1],
+        'disease_pig_Mange': [1, 0, 0],
+    })
+    df, _ = pipeline.preprocess_survey(raw)
+
+    assert 'used_Penicillin' not in df.columns
+    assert df['antibiotic_variety'].tolist() == [1, 1, 3]
+    assert df['pig_disease_count'].tolist() == [1, 0, 0]
+    assert df['chicken_disease_count'].tolist() == [0, 0, 0]
+    assert pipeline.flag_cohort(df, 'antibiotic', ['used_Tylosin', 'used_Colistin']).tolist() == [False, True, True]
+    assert pipeline.flag_cohort(df, 'antibiotic', ['used_Penicillin', 'used_Tylosin'],
+                                require_all=True).tolist() == [False, False, True]
+    with pytest.raises(KeyError):
+        pipeline.flag_cohort(df, 'antibiotic', ['used_Amoxicillin'])
+
+
+def test_id_list_cells_are_parsed_not_evaluated(tmp_path):
+    marker = tmp_path / 'ran'
+    cell = f"__import__('pathlib').Path({str(marker)!r}).touch()"
+    assert featurize.parse_id_list(cell) == []
+    assert not marker.exists()
+
+    assert featurize.parse_id_list('[1, 3]') == [1, 3]
+    assert featurize.parse_id_list([2]) == [2]
+    assert featurize.parse_id_list('5') == []
+    assert featurize.parse_id_list(None) == []
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import geo
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * geo.EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def farms(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        '_id': np.arange(1000, 1000 + n),
+        'latitude': rng.uniform(-17.0, -9.0, n),
+        'longitude': rng.uniform(32.5, 36.0, n),
+        'farm_type': rng.choice(['Pig Farm', 'Poultry farm', 'Both'], n),
+        'risk_score': rng.uniform(0, 100, n),
+    })
+
+
+def test_nearest_matches_brute_force_haversine():
+    df = farms(500)
+    index = geo.FarmIndex(df)
+    rng = np.random.default_rng(1)
+    for lat, lon in zip(rng.uniform(-18, -8, 25), rng.uniform(32, 37, 25)):
+        rows, distances = index.nearest(lat, lon, 10)
+        brute = haversine_km(lat, lon, df['latitude'].to_numpy(), df['longitude'].to_numpy())
+        order = np.argsort(brute)[:10]
+        assert index.farm_id[rows].tolist() == df['_id'].to_numpy()[order].tolist()
+        np.testing.assert_allclose(distances, brute[order], rtol=1e-9)
+
+        rows, distances = index.within(lat, lon, 50)
+        assert sorted(index.farm_id[rows].tolist()) == sorted(df['_id'].to_numpy()[brute <= 50].tolist())
+
+
+def test_coordinates_fall_back_to_gps_columns():
+    df = farms(20).rename(columns={'latitude': '_Location_latitude', 'longitude': '_Location_longitude'})
+    lat, lon = geo.farm_coordinates(df)
+    np.testing.assert_array_equal(lat, df['_Location_latitude'].to_numpy())
+    np.testing.assert_array_equal(lon, df['_Location_longitude'].to_numpy())
+
+    lat, lon = geo.farm_coordinates(df.drop(columns=['_Location_latitude', '_Location_longitude']))
+    assert np.isnan(lat).all() and np.isnan(lon).all()
+
+
+def test_failed_build_is_reported_not_retried(tmp_path, monkeypatch):
+    data_path = tmp_path / 'survey.csv'
+    data_path.write_text('gender,age\nMale,36-49\n')
+    builds = []
+
+    def build_index(path):
+        builds.append(path)
+        raise ValueError("No farm in the survey has usable coordinates")
+
+    monkeypatch.setattr(geo, 'build_index', build_index)
+    monkeypatch.setattr(geo, '_indexes', {})
+    monkeypatch.setattr(geo, '_failures', {})
+
+    for _ in range(3):
+        status = geo.index_status(str(data_path))
+        assert status['available'] is False and 'usable coordinates' in status['error']
+    with pytest.raises(RuntimeError):
+        geo.load_index(str(data_path))
+    assert len(builds) == 1
+
+
+@pytest.mark.parametrize('payload', [
+    {}, {'k': 3}, {'latitude': -15.6, 'longitude': 35.0, 'k': 0}, {'latitude': 'x', 'longitude': 35.0, 'k': 2},
+    {'latitude': -15.6, 'longitude': 35.0, 'radius_km': -1}, {'farm_id': [1], 'k': 2}, [1],
+])
+def test_bad_requests_return_an_error(payload):
+    assert set(geo.handle_request(payload)) == {'error'}
+
+
+def test_unknown_farm_returns_an_error(monkeypatch):
+    monkeypatch.setattr(geo, 'load_index', lambda data_path: geo.FarmIndex(farms(20)))
+    assert geo.handle_request({'farm_id': 1, 'k': 2}) == {'error': 'No located farm with id 1'}
+    assert geo.handle_request({'farm_id': 1005, 'k': 2})['count'] == 2
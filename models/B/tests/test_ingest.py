@@ -0,0 +1,26 @@
+import os
+import shutil
+
+import ingest
+
+B_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_new_cache_entry_replaces_stale_ones(tmp_path):
+    data_path = str(tmp_path / 'survey.csv')
+    other_path = str(tmp_path / 'survey-2024.csv')
+    shutil.copy(os.path.join(B_DIR, 'Dataset.csv'), data_path)
+    shutil.copy(os.path.join(B_DIR, 'Dataset.csv'), other_path)
+    ingest.load_survey(other_path)
+    first = ingest.cache_path_for(data_path)
+    ingest.load_survey(data_path)
+    # A derived file for the same contents, as geo.py writes one
+    open(os.path.splitext(first)[0] + '.geo.pkl', 'w').close()
+
+    with open(data_path, 'a') as f:
+        f.write(open(os.path.join(B_DIR, 'Dataset.csv')).read().splitlines()[1] + '\n')
+    ingest.load_survey(data_path)
+
+    cache_dir = os.path.dirname(first)
+    assert sorted(os.listdir(cache_dir)) == sorted(
+        os.path.basename(ingest.cache_path_for(path)) for path in (data_path, other_path))
@@ -0,0 +1,300 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SOIL_PAYLOAD = {
+    "Nitrogen": 90,
+    "Phosphorus": 42,
+    "Potassium": 43,
+    "temprature": 20.8,
+    "humidity": 82,
+    "ph": 6.5,
+    "rainfall": 200
+}
+
+YIELD_PAYLOAD = {
+    "Crop": "Rice",
+    "Season": "Kharif",
+    "State": "Assam",
+    "Area": 1000,
+    "Production": 2000,
+    "Annual_Rainfall": 2000,
+    "Fertilizer": 100000,
+    "Pesticide": 300
+}
+
+FARM_PAYLOAD = {
+    "gender": "male",
+    "age": 35,
+    "education": "secondary",
+    "farm_type": "pigfarm",
+    "years_farming": 10,
+    "follow_prescription": 1,
+    "check_expiry": 1,
+    "increase_dosage": 0,
+    "improvement_stop": 0,
+    "misuse_amr": 0,
+    "training_usage": 1,
+    "consult_veterinan": 1,
+    "amr_is_problem": 0,
+    "regulations": 1,
+    "withdraw": 1,
+    "importance_withdraw": 2,
+    "e_dispose": "return",
+    "p_dispose": "incineration",
+    "manure_mngt": "composting",
+    "store": "1-2 weeks",
+    "disease_chicken": [1, 3],
+    "disease_pig": [2],
+    "antibiotics_used": [1, 5]
+}
+
+# Entry point -> script, stdin payload (as the backend sends it) and the
+# third-party libraries it imports, timed separately from the module itself
+ENTRY_POINTS = {
+    "modelA1": {"script": os.path.join("A", "modelA1.py"), "payload": SOIL_PAYLOAD,
+                "libraries": ["numpy", "sklearn", "xgboost"]},
+    "modelA2": {"script": os.path.join("A", "modelA2.py"), "payload": YIELD_PAYLOAD,
+                "libraries": ["numpy", "sklearn", "xgboost"]},
+    "modelB": {"script": os.path.join("B", "modelB.py"), "payload": {"input_data": FARM_PAYLOAD},
+               "libraries": ["numpy", "pandas", "sklearn"]},
+    "model2": {"script": os.path.join("B", "model2.py"), "payload": FARM_PAYLOAD,
+               "libraries": ["numpy", "pandas", "sklearn"]},
+}
+
+
+def percentiles(samples):
+    """
+    Latency summary in milliseconds
+    """
+    import numpy as np
+
+    ms = np.asarray(samples, dtype=float) * 1000
+    return {
+        "n": int(ms.size),
+        "mean_ms": float(ms.mean()),
+        "min_ms": float(ms.min()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.phases = {}
+
+    def time(self, phase, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.phases[phase] = self.phases.get(phase, 0.0) + time.perf_counter() - start
+        return result
+
+
+# --- per-entry-point phase breakdowns (run inside a fresh worker process) ---
+
+def _phases_modelA1(timer, payload):
+    module = timer.time("import_module", importlib.import_module, "modelA1")
+    classifier = timer.time("pickle_load", module.registry.get, "xgb")
+    features = timer.time("preprocess", module.soil_feature_matrix, [payload])
+    encoded = timer.time("predict", classifier.predict, features)
+    crop = timer.time("postprocess", lambda: module.crop_names[int(encoded[0])])
+    timer.time("json_dump", json.dumps, {"Prediction": crop})
+    return lambda: json.dumps(module.handle_request(payload))
+
+
+def _phases_modelA2(timer, payload):
+    module = timer.time("import_module", importlib.import_module, "modelA2")
+    encoder = timer.time("pickle_load", module.registry.get, "ct")
+    regressor = timer.time("pickle_load", module.registry.get, "xgb")
+    features = timer.time("preprocess", module.yield_feature_matrix, [payload])
+    features = timer.time("preprocess", encoder.transform, features)
+    prediction = timer.time("predict", regressor.predict, features)
+    timer.time("json_dump", json.dumps, {"Prediction": prediction[0]}, default=module.make_serializable)
+    return lambda: json.dumps(module.handle_request(payload), default=module.make_serializable)
+
+
+def _phases_modelB(timer, payload):
+    module = timer.time("import_module", importlib.import_module, "modelB")
+    model_data = timer.time("pickle_load", module.load_model_data)
+    plan, amu_index, _ = timer.time("compile_plan", module.feature_plan, model_data)
+    row = timer.time("preprocess", plan.fill, payload)
+    timer.time("predict", model_data["amu_model"].predict_proba, row.take(amu_index, axis=1))
+    result = timer.time("predict_from_json", module.predict_from_json, payload)
+    timer.time("json_dump", json.dumps, result, indent=2, default=module.convert_np_int)
+    return lambda: json.dumps(module.predict_from_json(payload), indent=2, default=module.convert_np_int)
+
+
+def _phases_model2(timer, payload):
+    module = timer.time("import_module", importlib.import_module, "model2")
+    # Same disease and antibiotic ID lists model2.main() uses
+    chicken, pig, antibiotics = list(range(1, 9)), list(range(1, 12)), list(range(1, 23))
+    csv_path = os.path.join(BASE_DIR, "B", "Dataset.csv")
+    # Trains on the first run, unpickles from model2_artifacts/ afterwards
+    artifacts = timer.time("load_or_train", module.load_or_train_models, csv_path, chicken, pig, antibiotics)
+    amu_model, bio_model = artifacts["amu_model"], artifacts["bio_model"]
+
+    def call():
+        return module.predict_from_json(payload, amu_model, bio_model, chicken, pig, antibiotics)
+
+    result = timer.time("predict_from_json", call)
+    timer.time("json_dump", json.dumps, result, default=module.convert_np_int)
+    return lambda: json.dumps(call(), default=module.convert_np_int)
+
+
+PHASES = {
+    "modelA1": _phases_modelA1,
+    "modelA2": _phases_modelA2,
+    "modelB": _phases_modelB,
+    "model2": _phases_model2,
+}
+
+
+def run_worker(name, warm_calls):
+    """
+    Time every phase from a fresh interpreter, then repeat the warm call path
+    """
+    process_start = time.perf_counter()
+    entry = ENTRY_POINTS[name]
+    sys.path.insert(0, os.path.join(BASE_DIR, os.path.dirname(entry["script"])))
+
+    timer = PhaseTimer()
+    for library in entry["libraries"]:
+        timer.time(f"import_{library}", importlib.import_module, library)
+
+    warm_call = PHASES[name](timer, entry["payload"])
+    first_answer = time.perf_counter() - process_start
+
+    latencies = []
+    for _ in range(warm_calls):
+        start = time.perf_counter()
+        warm_call()
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        "phases_ms": {phase: seconds * 1000 for phase, seconds in timer.phases.items()},
+        "in_process_first_answer_ms": first_answer * 1000,
+        "warm": percentiles(latencies) if latencies else None,
+    }
+
+
+def run_cold(name, runs):
+    """
+    Wall-clock time of `python3 <script>` from spawn to exit, as the backend runs it
+    """
+    entry = ENTRY_POINTS[name]
+    script = os.path.join(BASE_DIR, entry["script"])
+    payload = json.dumps(entry["payload"])
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, script], input=payload, capture_output=True, text=True)
+        samples.append(time.perf_counter() - start)
+        if completed.returncode != 0:
+            raise RuntimeError(f"{name} exited with code {completed.returncode}: {completed.stderr[-2000:]}")
+    return percentiles(samples)
+
+
+def run_benchmarks(names, cold_runs, warm_calls):
+    results = {}
+    for name in names:
+        print(f"benchmarking {name}...", file=sys.stderr)
+        worker = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", name, "--warm-calls", str(warm_calls)],
+            capture_output=True, text=True,
+        )
+        if worker.returncode != 0:
+            raise RuntimeError(f"{name} worker failed: {worker.stderr[-2000:]}")
+        results[name] = json.loads(worker.stdout.strip().splitlines()[-1])
+        results[name]["cold_start"] = run_cold(name, cold_runs) if cold_runs else None
+    return results
+
+
+def environment():
+    versions = {}
+    for library in ["numpy", "pandas", "sklearn", "xgboost"]:
+        try:
+            versions[library] = importlib.import_module(library).__version__
+        except ImportError:
+            versions[library] = None
+    try:
+        revision = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BASE_DIR,
+                                  capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        revision = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "libraries": versions,
+    }
+
+
+def compare(current, baseline):
+    """
+    Relative change of the headline numbers against a previous results file
+    """
+    rows = []
+    for name, result in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            continue
+        for section, metric in [("cold_start", "p50_ms"), ("warm", "p50_ms"), ("warm", "p99_ms")]:
+            new_value = (result.get(section) or {}).get(metric)
+            old_value = (old.get(section) or {}).get(metric)
+            if new_value is None or not old_value:
+                continue
+            rows.append({
+                "entry_point": name,
+                "metric": f"{section}.{metric}",
+                "baseline": old_value,
+                "current": new_value,
+                "change_pct": (new_value - old_value) / old_value * 100,
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup and latency benchmarks for the model entry points")
+    parser.add_argument("--entry", action="append", choices=sorted(ENTRY_POINTS),
+                        help="entry point to benchmark (repeatable, default: all)")
+    parser.add_argument("--cold-runs", type=int, default=5, help="fresh python3 spawns per entry point")
+    parser.add_argument("--warm-calls", type=int, default=200, help="in-process calls after warm-up")
+    parser.add_argument("--output", help="write results JSON here instead of stdout")
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    parser.add_argument("--worker", choices=sorted(ENTRY_POINTS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.warm_calls)))
+        return
+
+    report = {
+        "environment": environment(),
+        "settings": {"cold_runs": args.cold_runs, "warm_calls": args.warm_calls},
+        "results": run_benchmarks(args.entry or list(ENTRY_POINTS), args.cold_runs, args.warm_calls),
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            report["comparison"] = compare(report, json.load(f))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
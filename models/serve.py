@@ -0,0 +1,192 @@
+import argparse
+import gc
+import json
+import os
+import signal
+import sys
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Make the model scripts importable as modules
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "A"))
+sys.path.insert(0, os.path.join(BASE_DIR, "B"))
+
+import modelA1
+import modelA2
+import geo
+import modelB
+import tracing
+
+# Route -> handler taking the same JSON payload the script reads from stdin
+# and returning the same JSON object the script prints to stdout
+ROUTES = {
+    "/A1": modelA1.handle_request,
+    "/A1/batch": modelA1.handle_batch_request,
+    "/A1/top-k": modelA1.handle_top_k_request,
+    "/A2": modelA2.handle_request,
+    "/A2/batch": modelA2.handle_batch_request,
+    "/B": modelB.predict_from_json,
+    "/B/nearby": geo.handle_request,
+}
+
+
+def warm_up(all_models=False):
+    """
+    Load the models the routes use up front so the first request is already warm.
+    all_models=True also loads the alternates (rfc, dtr) so forked workers can
+    share them instead of each unpickling its own copy.
+    """
+    modelA1.registry.load_all(None if all_models else ["xgb"])
+    modelA2.registry.load_all(None if all_models else ["xgb", "ct"])
+    modelB.load_model_data()
+    # The farm index only backs /B/nearby; the other routes serve without it
+    try:
+        geo.load_index()
+    except (OSError, RuntimeError) as e:
+        print(f"farm index not loaded, /B/nearby unavailable: {e}", file=sys.stderr)
+
+
+def make_serializable(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Type {type(obj)} not serializable")
+
+
+class ModelRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, default=make_serializable).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {
+                "status": "ok",
+                "pid": os.getpid(),
+                "routes": sorted(ROUTES),
+                "models": {"A1": modelA1.registry.stats(), "A2": modelA2.registry.stats()},
+                "caches": {"A1": modelA1.soil_cache.stats()},
+                "feature_plans": {"B": modelB.feature_plan(modelB.load_model_data())[0].describe()},
+                "farm_index": geo.index_status(),
+            })
+        else:
+            self._send_json(404, {"error": f"Unknown route: {self.path}"})
+
+    def do_POST(self):
+        handler = ROUTES.get(self.path)
+        if handler is None:
+            self._send_json(404, {"error": f"Unknown route: {self.path}"})
+            return
+
+        # Sampled per-stage timings, one JSON line per traced request (HEXA_TRACE)
+        with tracing.trace("serve", route=self.path):
+            self._handle_post(handler)
+
+    def _handle_post(self, handler):
+        try:
+            with tracing.span("parse"):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self._send_json(400, {"error": f"Invalid JSON body: {e}"})
+            return
+
+        try:
+            with tracing.span("handler"):
+                result = handler(payload)
+        except Exception as e:
+            # Same failure mode as a non-zero exit from the script
+            traceback.print_exc(file=sys.stderr)
+            self._send_json(500, {"error": str(e)})
+            return
+
+        with tracing.span("serialize"):
+            self._send_json(200, result)
+
+    def log_message(self, format, *args):
+        # Per-request access logs cost more than the predictions themselves
+        pass
+
+
+def serve_prefork(server, workers):
+    """
+    Fork `workers` processes that accept on the parent's listening socket.
+    Models were loaded before the fork, so workers share them copy-on-write;
+    a worker that dies is replaced.
+    """
+    # Move everything loaded so far out of the collector's reach, so GC passes
+    # in the workers don't touch (and copy) the pages holding the models
+    gc.freeze()
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                os._exit(0)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    for _ in range(workers):
+        spawn()
+
+    try:
+        while children:
+            pid, status = os.wait()
+            children.discard(pid)
+            if not stopping:
+                print(f"worker {pid} exited with status {status}, restarting", file=sys.stderr)
+                spawn()
+    except KeyboardInterrupt:
+        stop(signal.SIGINT, None)
+        for pid in list(children):
+            os.waitpid(pid, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm inference server for the HexaHarvest models")
+    parser.add_argument("--host", default=os.environ.get("MODEL_SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("MODEL_SERVER_PORT", 8500)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("MODEL_SERVER_WORKERS", 1)),
+                        help="pre-forked worker processes sharing the loaded models (default: 1, no fork)")
+    args = parser.parse_args()
+
+    prefork = args.workers > 1
+    warm_up(all_models=prefork)
+    server = ThreadingHTTPServer((args.host, args.port), ModelRequestHandler)
+    print(f"model server listening on http://{args.host}:{args.port}"
+          + (f" with {args.workers} workers" if prefork else ""), file=sys.stderr)
+    try:
+        if prefork:
+            serve_prefork(server, args.workers)
+        else:
+            server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
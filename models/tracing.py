@@ -0,0 +1,137 @@
+import contextvars
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+# Off unless HEXA_TRACE is set: "1"/"stderr" writes to stderr, anything else is
+# a file path the JSON lines are appended to. HEXA_TRACE_SAMPLE is the fraction
+# of requests traced (default: all of them once tracing is on).
+TRACE_TARGET = os.environ.get("HEXA_TRACE", "")
+TRACE_SAMPLE = float(os.environ.get("HEXA_TRACE_SAMPLE", "1.0"))
+
+_current = contextvars.ContextVar("hexa_trace", default=None)
+_write_lock = threading.Lock()
+
+
+class _NullSpan:
+    """
+    Stand-in for untraced requests; every call is a no-op
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+        self.attributes = {}
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record = {
+            "name": self.name,
+            "start_ms": (self.start - self.trace.start) * 1000,
+            "duration_ms": (time.perf_counter() - self.start) * 1000,
+        }
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        if self.attributes:
+            record["attributes"] = self.attributes
+        self.trace.spans.append(record)
+        return False
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+class Trace:
+    """
+    One sampled request: a list of timed spans written out as a single JSON line
+    """
+
+    def __init__(self, name, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.spans = []
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.timestamp = time.time()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        record = {
+            "trace": self.name,
+            "trace_id": self.trace_id,
+            "pid": os.getpid(),
+            "timestamp": self.timestamp,
+            "total_ms": (time.perf_counter() - self.start) * 1000,
+            "spans": self.spans,
+        }
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        if self.attributes:
+            record["attributes"] = self.attributes
+        emit(record)
+        return False
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+def enabled():
+    return bool(TRACE_TARGET)
+
+
+def trace(name, **attributes):
+    """
+    Start a trace for one request, or return NULL_SPAN when tracing is off or
+    this request is not sampled. Use as a context manager around the request.
+    """
+    if not TRACE_TARGET or _current.get() is not None:
+        return NULL_SPAN
+    if TRACE_SAMPLE < 1.0 and random.random() >= TRACE_SAMPLE:
+        return NULL_SPAN
+    return Trace(name, **attributes)
+
+
+def span(name):
+    """
+    Timed span inside the current trace; NULL_SPAN when the request is not traced
+    """
+    current = _current.get()
+    if current is None:
+        return NULL_SPAN
+    return Span(current, name)
+
+
+def emit(record):
+    line = json.dumps(record, default=str) + "\n"
+    with _write_lock:
+        if TRACE_TARGET in ("1", "stderr"):
+            sys.stderr.write(line)
+            sys.stderr.flush()
+        else:
+            with open(TRACE_TARGET, "a") as f:
+                f.write(line)
@@ -0,0 +1,142 @@
+import numpy as np
+
+TREE_LEAF = -1
+
+
+class CompiledTreeModel:
+    """
+    Fitted sklearn decision tree or random forest compiled into flat node arrays
+    (feature, threshold, children, value) and evaluated with vectorized NumPy
+    traversal. predict / predict_proba match the sklearn outputs bit-for-bit.
+    """
+
+    def __init__(self, estimator):
+        trees = getattr(estimator, "estimators_", None)
+        if trees is None:
+            trees = [estimator]
+        if not all(hasattr(tree, "tree_") for tree in trees):
+            raise ValueError(f"{type(estimator).__name__} is not a fitted sklearn tree model")
+
+        self.is_classifier = hasattr(estimator, "classes_")
+        self.classes_ = getattr(estimator, "classes_", None)
+        self.n_features_in_ = estimator.n_features_in_
+        if hasattr(estimator, "feature_names_in_"):
+            self.feature_names_in_ = estimator.feature_names_in_
+        self.n_trees = len(trees)
+
+        roots, features, thresholds, lefts, rights, missing_left, values = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for tree in trees:
+            t = tree.tree_
+            node_ids = np.arange(t.node_count) + offset
+            is_leaf = t.children_left == TREE_LEAF
+
+            roots.append(offset)
+            # Leaves point back at themselves, so samples that reach a leaf
+            # early simply stay there while the others keep descending
+            lefts.append(np.where(is_leaf, node_ids, t.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, t.children_right + offset))
+            features.append(np.where(is_leaf, 0, t.feature))
+            thresholds.append(t.threshold)
+            missing_left.append(np.asarray(t.missing_go_to_left, dtype=bool))
+            values.append(self._leaf_values(t, len(self.classes_) if self.is_classifier else None))
+
+            offset += t.node_count
+            max_depth = max(max_depth, t.max_depth)
+
+        self.roots = np.array(roots, dtype=np.intp)
+        self.feature = np.concatenate(features).astype(np.intp)
+        self.threshold = np.concatenate(thresholds).astype(np.float64)
+        self.left = np.concatenate(lefts).astype(np.intp)
+        self.right = np.concatenate(rights).astype(np.intp)
+        self.is_leaf = self.left == np.arange(len(self.left))
+        self.missing_go_to_left = np.concatenate(missing_left)
+        self.value = np.concatenate(values)
+        self.max_depth = max_depth
+
+    @staticmethod
+    def _leaf_values(t, n_classes):
+        if n_classes is None:
+            # Regressors: one value per output
+            return t.value[:, :, 0].astype(np.float64)
+
+        # Classifiers: per-node class probabilities, normalized the way
+        # DecisionTreeClassifier.predict_proba does it
+        proba = np.ascontiguousarray(t.value[:, 0, :n_classes], dtype=np.float64)
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        return proba / normalizer
+
+    def _validate(self, X):
+        if hasattr(X, "columns") and hasattr(self, "feature_names_in_"):
+            X = X[list(self.feature_names_in_)]
+        # sklearn evaluates splits on float32 inputs against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but the model expects {self.n_features_in_}")
+        return X
+
+    def apply(self, X):
+        """
+        Leaf node index (into the flat arrays) for every sample and tree, shape (n_samples, n_trees)
+        """
+        X = self._validate(X)
+        if len(X) == 1 and self.n_trees == 1:
+            return np.array([[self._apply_one(X[0], self.roots[0])]], dtype=np.intp)
+
+        nodes = np.repeat(self.roots[np.newaxis, :], len(X), axis=0)
+        row_offsets = (np.arange(len(X)) * X.shape[1])[:, np.newaxis]
+        flat_X = X.ravel()
+        has_missing = bool(np.isnan(flat_X).any())
+
+        for _ in range(self.max_depth):
+            if self.is_leaf.take(nodes).all():
+                break
+            x = flat_X.take(row_offsets + self.feature.take(nodes))
+            go_left = x <= self.threshold.take(nodes)
+            if has_missing:
+                go_left = np.where(np.isnan(x), self.missing_go_to_left.take(nodes), go_left)
+            nodes = np.where(go_left, self.left.take(nodes), self.right.take(nodes))
+        return nodes
+
+    def _apply_one(self, x, node):
+        # Scalar walk for a single row through a single tree; cheaper than
+        # max_depth rounds of array calls on one element
+        while not self.is_leaf[node]:
+            value = x[self.feature[node]]
+            if value != value:
+                go_left = self.missing_go_to_left[node]
+            else:
+                go_left = value <= self.threshold[node]
+            node = self.left[node] if go_left else self.right[node]
+        return node
+
+    def _average(self, leaves):
+        # Accumulate tree by tree, in order, like the sklearn forests do
+        out = self.value[leaves[:, 0]].copy()
+        for i in range(1, self.n_trees):
+            out += self.value[leaves[:, i]]
+        if self.n_trees > 1:
+            out /= self.n_trees
+        return out
+
+    def predict_proba(self, X):
+        if not self.is_classifier:
+            raise AttributeError("predict_proba is only available for classifiers")
+        return self._average(self.apply(X))
+
+    def predict(self, X):
+        averaged = self._average(self.apply(X))
+        if self.is_classifier:
+            return self.classes_.take(np.argmax(averaged, axis=1), axis=0)
+        return averaged[:, 0] if averaged.shape[1] == 1 else averaged
+
+
+def compile_tree_model(estimator):
+    """
+    Compile a fitted DecisionTree*/RandomForest* estimator for the NumPy engine
+    """
+    return CompiledTreeModel(estimator)